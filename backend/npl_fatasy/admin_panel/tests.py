@@ -1,3 +1,73 @@
+import json
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+
+class StreamingListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO teams (team_id, team_name, acronym)
+                VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB');
+
+                INSERT INTO players (player_id, player_name, role, cost, team_id)
+                SELECT t.acronym || '00' || i, t.team_name || ' ' || i, 'BATTER', 7.5, t.team_id
+                FROM teams t
+                CROSS JOIN generate_series(1, 3) i;
+
+                INSERT INTO matches (match_id, match_date, team_1, team_2)
+                VALUES (1, DATE '2026-01-01', 1, 2), (2, DATE '2999-01-01', 2, 1);
+            """)
+
+        cls.admin = User.objects.create_superuser("admin", password="x")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def body(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_streams_one_row_per_line(self):
+        regular = self.client.get("/admin_panel/players/").json()["players"]
+
+        for kwargs in ({"data": {"stream": "ndjson"}}, {"HTTP_ACCEPT": "application/x-ndjson"}):
+            with self.subTest(**kwargs):
+                response = self.client.get("/admin_panel/players/", **kwargs)
+
+                self.assertEqual(response["Content-Type"], "application/x-ndjson")
+                lines = self.body(response).splitlines()
+                self.assertEqual([json.loads(line) for line in lines], regular)
+                self.assertEqual(lines[0], json.dumps({
+                    "player_id": "AAA001", "player_name": "Alpha 1", "role": "BATTER",
+                    "cost": "7.5", "team_name": "Alpha", "acronym": "AAA",
+                }))
+
+    def test_json_stream_matches_the_regular_body(self):
+        for path in ("/admin_panel/players/", "/admin_panel/matches/"):
+            with self.subTest(path=path):
+                regular = self.client.get(path)
+                streamed = self.client.get(path, {"stream": "1"})
+
+                self.assertFalse(regular.streaming)
+                self.assertEqual(streamed["Content-Type"], "application/json")
+                self.assertEqual(json.loads(self.body(streamed)), regular.json())
+
+    def test_empty_stream_is_valid_json(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM players")
+
+        response = self.client.get("/admin_panel/players/", {"stream": "json"})
+
+        self.assertEqual(json.loads(self.body(response)), {"players": []})
+
+    def test_matches_stream_maps_each_row(self):
+        response = self.client.get("/admin_panel/matches/", {"stream": "ndjson"})
+
+        self.assertEqual([json.loads(line) for line in self.body(response).splitlines()], [
+            {"id": 1, "teams": "Alpha vs Bravo", "match_date": "2026-01-01", "status": "Completed"},
+            {"id": 2, "teams": "Bravo vs Alpha", "match_date": "2999-01-01", "status": "Upcoming"},
+        ])
@@ -6,6 +6,7 @@ app_name = "admin_panel"
 urlpatterns = [
     path("login/", views.admin_login_api, name="admin_login_api"),
     path("session/", views.admin_session_api, name="admin_session_api"),
+    path("query-timing/", views.query_timing_api, name="query_timing_api"),
     # ===========================
     # TEAMS
     # ===========================
@@ -1,10 +1,17 @@
 from django.http import JsonResponse
 from django.db import connection, IntegrityError
+from npl_fatasy.db import dictfetchall, namedtuplefetchall, stream
 from django.views.decorators.csrf import csrf_exempt
 import json
 from django.utils.timezone import localdate
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
+from fantasy_teams.catalog import invalidate_squads
+from players.ids import create_player
+from teams.deletion import delete_match, delete_team
+from npl_fatasy.cache import invalidate_responses
+from npl_fatasy.middleware import histogram_report
+from npl_fatasy.streaming import stream_format, streaming_json_response
 
 @login_required
 def admin_session_api(request):
@@ -13,6 +20,17 @@ def admin_session_api(request):
     return JsonResponse({"authenticated": False}, status=403)
 
 
+@login_required
+def query_timing_api(request):
+    """
+    This worker process's per-endpoint DB-time histogram since the last
+    logged dump, plus its connection pool counters.
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({"error": "Admin only"}, status=403)
+    return JsonResponse(histogram_report())
+
+
 def admin_login_api(request):
     if request.method != "POST":
         return JsonResponse({"error": "POST required"}, status=405)
@@ -34,14 +52,6 @@ def admin_login_api(request):
         return JsonResponse({"error": "Invalid request"}, status=400)
     
 
-# ===========================
-# HELPER
-# ===========================
-def dictfetchall(cursor):
-    columns = [col[0] for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-
 # ===========================
 # TEAMS CRUD
 # ===========================
@@ -72,13 +82,14 @@ def add_team_api(request):
 
     try:
         with connection.cursor() as cursor:
-            cursor.execute("SELECT COALESCE(MAX(team_id), 0) + 1 FROM teams")
-            new_id = cursor.fetchone()[0]
-            cursor.execute(
-                "INSERT INTO teams (team_id, team_name, acronym) VALUES (%s, %s, %s)",
-                [new_id, team_name, acronym],
-            )
-        return JsonResponse({"status": "created"})
+            cursor.execute("""
+                INSERT INTO teams (team_id, team_name, acronym)
+                VALUES (nextval('teams_team_id_alloc_seq'), %s, %s)
+                RETURNING team_id
+            """, [team_name, acronym])
+            team_id = cursor.fetchone()[0]
+        invalidate_responses("teams")
+        return JsonResponse({"status": "created", "team_id": team_id})
     except IntegrityError as e:
         return JsonResponse({"error": str(e)}, status=400)
 
@@ -99,6 +110,8 @@ def edit_team_api(request, team_id):
                 "UPDATE teams SET team_name=%s, acronym=%s WHERE team_id=%s",
                 [team_name, acronym, team_id],
             )
+        invalidate_squads()
+        invalidate_responses("teams", "matches", "players")
         return JsonResponse({"status": "updated"})
     except IntegrityError:
         return JsonResponse({"error": "Update failed"}, status=400)
@@ -109,28 +122,41 @@ def edit_team_api(request, team_id):
 def delete_team_api(request, team_id):
     if request.method != "DELETE":
         return JsonResponse({"error": "DELETE required"}, status=405)
-    with connection.cursor() as cursor:
-        cursor.execute("DELETE FROM players WHERE team_id=%s", [team_id])
-        cursor.execute("""
-            DELETE FROM matches
-            WHERE team_1=%s OR team_2=%s
-        """, [team_id, team_id])
-        cursor.execute("DELETE FROM teams WHERE team_id=%s", [team_id])
-    return JsonResponse({"status": "deleted"})
+
+    # ?dry_run=1 reports what would be deleted without deleting it.
+    dry_run = request.GET.get("dry_run") in ("1", "true")
+    counts = delete_team(team_id, dry_run=dry_run)
+
+    if not counts["teams"]:
+        return JsonResponse({"error": "Team not found"}, status=404)
+
+    if dry_run:
+        return JsonResponse({"status": "dry_run", "affected": counts})
+
+    invalidate_squads()
+    invalidate_responses("teams", "matches", "players")
+    return JsonResponse({"status": "deleted", "affected": counts})
 
 
 # ===========================
 # PLAYERS CRUD
 # ===========================
+LIST_PLAYERS_SQL = """
+    SELECT p.player_id, p.player_name, p.role, p.cost, t.team_name, t.acronym
+    FROM players p
+    JOIN teams t ON p.team_id = t.team_id
+    ORDER BY p.player_name
+"""
+
+
 @login_required
 def list_players_api(request):
+    fmt = stream_format(request)
+    if fmt:
+        return streaming_json_response(stream(LIST_PLAYERS_SQL), "players", fmt)
+
     with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT p.player_id, p.player_name, p.role, p.cost, t.team_name, t.acronym
-            FROM players p
-            JOIN teams t ON p.team_id = t.team_id
-            ORDER BY p.player_name
-        """)
+        cursor.execute(LIST_PLAYERS_SQL)
         players = dictfetchall(cursor)
     return JsonResponse({"players": players})
 
@@ -154,43 +180,15 @@ def add_player_api(request):
     if not all([player_name, role, cost, team_id]):
         return JsonResponse({"error": "Missing fields"}, status=400)
 
-    # Get team acronym
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT acronym FROM teams WHERE team_id=%s", [team_id])
-        team = cursor.fetchone()
-
-    if not team:
-        return JsonResponse({"error": "Invalid team"}, status=400)
-
-    team_acronym = team[0]
-
-    # Generate player_id
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT player_id
-            FROM players
-            WHERE player_id LIKE %s
-            ORDER BY player_id DESC
-            LIMIT 1
-        """, [f"{team_acronym}%"])
-        last = cursor.fetchone()
-
-    if last:
-        last_id = last[0]
-        number = int(last_id.replace(team_acronym, ""))
-        new_number = number + 1
-    else:
-        new_number = 1
-
-    new_player_id = f"{team_acronym}{new_number:03d}"
-
+    # player_id = team acronym + next number from player_id_counters
     try:
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO players (player_id, player_name, role, cost, team_id)
-                VALUES (%s,%s,%s,%s,%s)
-            """, [new_player_id, player_name, role, cost, team_id])
+        new_player_id = create_player(player_name, role, cost, team_id)
+
+        if not new_player_id:
+            return JsonResponse({"error": "Invalid team"}, status=400)
 
+        invalidate_squads()
+        invalidate_responses("players")
         return JsonResponse({"status": "created", "player_id": new_player_id})
     except IntegrityError:
         return JsonResponse({"error": "Player exists or invalid team"}, status=400)
@@ -216,6 +214,8 @@ def edit_player_api(request, player_id):
                 WHERE player_id=%s
             """, [player_name, role, cost, team_id, player_id])
 
+        invalidate_squads()
+        invalidate_responses("players")
         return JsonResponse({"status": "updated"})
     except IntegrityError:
         return JsonResponse({"error": "Update failed"}, status=400)
@@ -228,33 +228,46 @@ def delete_player_api(request, player_id):
         return JsonResponse({"error": "DELETE required"}, status=405)
     with connection.cursor() as cursor:
         cursor.execute("DELETE FROM players WHERE player_id=%s", [player_id])
+    invalidate_squads()
+    invalidate_responses("players")
     return JsonResponse({"status": "deleted"})
 
 
 # ===========================
 # MATCHES CRUD
 # ===========================
+LIST_MATCHES_SQL = """
+    SELECT m.match_id, m.match_date, t1.team_name AS team1_name, t2.team_name AS team2_name
+    FROM matches m
+    JOIN teams t1 ON m.team_1 = t1.team_id
+    JOIN teams t2 ON m.team_2 = t2.team_id
+    ORDER BY m.match_date ASC
+"""
+
+
+def match_row(row, today):
+    return {
+        "id": row.match_id,
+        "teams": f"{row.team1_name} vs {row.team2_name}",
+        "match_date": row.match_date.strftime("%Y-%m-%d"),
+        "status": "Upcoming" if row.match_date >= today else "Completed"
+    }
+
+
 @login_required
 def list_matches_api(request):
+    today = localdate()
+
+    fmt = stream_format(request)
+    if fmt:
+        rows = stream(LIST_MATCHES_SQL, row_type="namedtuple")
+        return streaming_json_response((match_row(row, today) for row in rows), "matches", fmt)
+
     with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT m.match_id, m.match_date, t1.team_name AS team1_name, t2.team_name AS team2_name
-            FROM matches m
-            JOIN teams t1 ON m.team_1 = t1.team_id
-            JOIN teams t2 ON m.team_2 = t2.team_id
-            ORDER BY m.match_date ASC
-        """)
-        rows = dictfetchall(cursor)
+        cursor.execute(LIST_MATCHES_SQL)
+        rows = namedtuplefetchall(cursor)
 
-    today = localdate()
-    matches = []
-    for row in rows:
-        matches.append({
-            "id": row["match_id"],
-            "teams": f"{row['team1_name']} vs {row['team2_name']}",
-            "match_date": row["match_date"].strftime("%Y-%m-%d"),
-            "status": "Upcoming" if row["match_date"] >= today else "Completed"
-        })
+    matches = [match_row(row, today) for row in rows]
 
     return JsonResponse({"matches": matches})
 
@@ -277,18 +290,18 @@ def add_match_api(request):
     if not all([match_date, team_1, team_2]):
         return JsonResponse({"error": "Missing fields"}, status=400)
 
-    # 🔹 Generate match_id = MAX + 1
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT COALESCE(MAX(match_id), 0) + 1 FROM matches")
-        match_id = cursor.fetchone()[0]
-
     try:
+        # 🔹 match_id comes from matches_match_id_alloc_seq
         with connection.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO matches (match_id, match_date, team_1, team_2)
-                VALUES (%s, %s, %s, %s)
-            """, [match_id, match_date, team_1, team_2])
+                VALUES (nextval('matches_match_id_alloc_seq'), %s, %s, %s)
+                RETURNING match_id
+            """, [match_date, team_1, team_2])
+            match_id = cursor.fetchone()[0]
 
+        invalidate_squads()
+        invalidate_responses("matches")
         return JsonResponse({
             "status": "created",
             "match_id": match_id
@@ -317,6 +330,8 @@ def edit_match_api(request, match_id):
                 WHERE match_id=%s
             """, [match_date, team_1, team_2, match_id])
 
+        invalidate_squads()
+        invalidate_responses("matches")
         return JsonResponse({"status": "updated"})
     except IntegrityError:
         return JsonResponse({"error": "Update failed"}, status=400)
@@ -327,6 +342,17 @@ def edit_match_api(request, match_id):
 def delete_match_api(request, match_id):
     if request.method != "DELETE":
         return JsonResponse({"error": "DELETE required"}, status=405)
-    with connection.cursor() as cursor:
-        cursor.execute("DELETE FROM matches WHERE match_id=%s", [match_id])
-    return JsonResponse({"status": "deleted"})
+
+    # ?dry_run=1 reports what would be deleted without deleting it.
+    dry_run = request.GET.get("dry_run") in ("1", "true")
+    counts = delete_match(match_id, dry_run=dry_run)
+
+    if not counts["matches"]:
+        return JsonResponse({"error": "Match not found"}, status=404)
+
+    if dry_run:
+        return JsonResponse({"status": "dry_run", "affected": counts})
+
+    invalidate_squads()
+    invalidate_responses("matches")
+    return JsonResponse({"status": "deleted", "affected": counts})
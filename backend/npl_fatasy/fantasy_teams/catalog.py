@@ -0,0 +1,92 @@
+import threading
+import time
+
+from django.conf import settings
+
+from npl_fatasy.db import dictfetchall
+from npl_fatasy.routing import primary_reads, read_connection, recently
+
+
+# In-process cache of each match's squad (players of both teams).
+# Rosters only change through the admin views, which call
+# invalidate_squads(); the TTL bounds staleness across worker processes.
+# Squads reloaded right after an invalidation come from the primary.
+SQUAD_CACHE_TTL = getattr(settings, "SQUAD_CACHE_TTL", 300)
+
+_lock = threading.Lock()
+_version = 0
+_invalidated_at = 0
+_squads = {}
+
+
+SQUAD_SQL = """
+    SELECT
+        p.player_id,
+        p.player_name,
+        p.role,
+        p.cost,
+        t.team_name,
+        t.team_id
+    FROM players p
+    JOIN teams t ON p.team_id = t.team_id
+    WHERE p.team_id IN (
+        SELECT team_1 FROM matches WHERE match_id = %s
+        UNION
+        SELECT team_2 FROM matches WHERE match_id = %s
+    )
+    ORDER BY t.team_name, p.player_name
+"""
+
+
+def _load_squad(match_id):
+    with read_connection().cursor() as cursor:
+        cursor.execute(SQUAD_SQL, [match_id, match_id])
+
+        return dictfetchall(cursor)
+
+
+def get_squad(match_id):
+    """
+    Return (players, players_by_id) for a match.
+
+    The returned objects are shared between requests; treat them as read-only.
+    """
+    now = time.monotonic()
+
+    with _lock:
+        entry = _squads.get(match_id)
+        version = _version
+
+    if entry and entry["version"] == version and now - entry["loaded_at"] < SQUAD_CACHE_TTL:
+        return entry["players"], entry["by_id"]
+
+    if recently(_invalidated_at):
+        with primary_reads():
+            players = _load_squad(match_id)
+    else:
+        players = _load_squad(match_id)
+    by_id = {p["player_id"]: p for p in players}
+
+    with _lock:
+        # Don't store a squad that was invalidated while we were loading it.
+        if _version == version:
+            _squads[match_id] = {
+                "version": version,
+                "loaded_at": now,
+                "players": players,
+                "by_id": by_id,
+            }
+
+    return players, by_id
+
+
+def invalidate_squads():
+    """
+    Drop every cached squad. Called after any team, player or match edit.
+    """
+    global _version, _invalidated_at
+
+    with _lock:
+        _version += 1
+        _invalidated_at = time.time_ns()
+        _squads.clear()
@@ -0,0 +1,146 @@
+from django.db import connection, transaction
+
+
+# Team selection closes when a match starts (matches.match_date).
+#
+# match_date is a DATE with no kickoff time, so "started" means
+# match_date <= NOW(): the date is read as 00:00 in the session time zone,
+# which Django sets to UTC. Selection therefore closes at 00:00 UTC on match
+# day, hours before kickoff, and the lock_matches cron freezes teams then.
+# Moving the deadline to kickoff needs a start timestamp on matches.
+#
+# lock_match() then copies every team of the match into
+# fantasy_team_snapshots in one statement, one row per pick with its
+# captain multiplier, and records the lock in match_locks. Scoring and
+# results read the snapshot; fantasy_team_players is only the editable
+# draft.
+#
+# Saves take FOR KEY SHARE on the match row and lock_match() takes FOR
+# UPDATE, so a freeze waits for saves in flight and any save after it
+# sees the lock.
+
+
+def is_editable(cursor, match_id, for_save=False):
+    """
+    True if teams for the match can still be changed: before 00:00 UTC on
+    match day and not locked. With for_save the match row stays KEY SHARE
+    locked until the caller's transaction ends.
+    """
+    cursor.execute(f"""
+        SELECT
+            m.match_date > NOW()
+            AND NOT EXISTS (
+                SELECT 1 FROM match_locks l WHERE l.match_id = m.match_id
+            )
+        FROM matches m
+        WHERE m.match_id = %s
+        {"FOR KEY SHARE OF m" if for_save else ""}
+    """, [match_id])
+
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def has_started(cursor, match_id):
+    """
+    True once the match's deadline has passed, None if the match is unknown.
+    """
+    cursor.execute("""
+        SELECT match_date <= NOW() FROM matches WHERE match_id = %s
+    """, [match_id])
+
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def lock_match(match_id):
+    """
+    Freeze the match's teams, once. Returns the number of teams frozen,
+    or None if the match is unknown or was already locked.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT 1 FROM matches WHERE match_id = %s FOR UPDATE
+        """, [match_id])
+
+        if cursor.fetchone() is None:
+            return None
+
+        cursor.execute("""
+            INSERT INTO match_locks (match_id)
+            VALUES (%s)
+            ON CONFLICT (match_id) DO NOTHING
+        """, [match_id])
+
+        if cursor.rowcount == 0:
+            return None
+
+        cursor.execute("""
+            WITH frozen AS (
+                INSERT INTO fantasy_team_snapshots
+                (match_id, user_id, player_id, multiplier)
+                SELECT
+                    match_id,
+                    user_id,
+                    player_id,
+                    CASE
+                        WHEN is_captain THEN 2
+                        WHEN is_vice_captain THEN 1.5
+                        ELSE 1
+                    END
+                FROM fantasy_team_players
+                WHERE match_id = %s
+                ORDER BY user_id, player_id
+                RETURNING user_id
+            )
+            UPDATE match_locks
+            SET teams = (SELECT COUNT(DISTINCT user_id) FROM frozen)
+            WHERE match_id = %s
+            RETURNING teams
+        """, [match_id, match_id])
+
+        return cursor.fetchone()[0]
+
+
+def lock_matches(match_ids):
+    """
+    Make sure every given match that has started is locked (no-op for those
+    that already are). Matches still open for selection are left alone.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT match_id
+            FROM matches
+            WHERE match_id = ANY(%s)
+              AND match_date <= NOW()
+              AND match_id NOT IN (SELECT match_id FROM match_locks)
+        """, [list(match_ids)])
+
+        pending = [row[0] for row in cursor.fetchall()]
+
+    for match_id in pending:
+        lock_match(match_id)
+
+
+def lock_started_matches():
+    """
+    Lock every match that has started. Returns [(match_id, teams_frozen)].
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT match_id
+            FROM matches
+            WHERE match_date <= NOW()
+              AND match_id NOT IN (SELECT match_id FROM match_locks)
+            ORDER BY match_id
+        """)
+
+        started = [row[0] for row in cursor.fetchall()]
+
+    locked = []
+    for match_id in started:
+        teams = lock_match(match_id)
+        if teams is not None:
+            locked.append((match_id, teams))
+
+    return locked
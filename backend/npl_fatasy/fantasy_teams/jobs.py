@@ -0,0 +1,166 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+from npl_fatasy.db import dictfetchall
+from leaderboard.standings import (
+    update_all_overall_ranks,
+    update_match_ranks,
+    update_overall_leaderboard_for_match,
+)
+from .deadline import has_started, lock_matches
+from .scoring import score_teams
+
+
+# Background scoring jobs, queued in the scoring_jobs table.
+#
+# A job scores its match in chunks of SCORING_CHUNK_SIZE teams (keyset on
+# user_id), committing progress after each chunk, then refreshes the
+# leaderboards. A job whose worker died is re-claimed once it has been
+# silent for SCORING_JOB_STALE_SECONDS and resumes from last_user_id.
+# Re-scoring is idempotent, so a re-run only repeats work, never double counts.
+SCORING_CHUNK_SIZE = getattr(settings, "SCORING_CHUNK_SIZE", 5000)
+SCORING_JOB_STALE_SECONDS = getattr(settings, "SCORING_JOB_STALE_SECONDS", 300)
+
+JOB_COLUMNS = """
+    job_id, match_id, status, teams_total, teams_done,
+    error, created_at, started_at, finished_at
+"""
+
+
+def enqueue_scoring_job(match_id):
+    """
+    Queue scoring for a match, or return the job already queued/running for it.
+    Returns (job, created). Callers check that the match has started.
+    """
+    with connection.cursor() as cursor:
+        # The live job may finish between the two statements; then one more
+        # INSERT queues a new one.
+        for _ in range(2):
+            cursor.execute(f"""
+                INSERT INTO scoring_jobs (match_id)
+                VALUES (%s)
+                ON CONFLICT (match_id) WHERE status IN ('queued', 'running')
+                DO NOTHING
+                RETURNING {JOB_COLUMNS}
+            """, [match_id])
+
+            rows = dictfetchall(cursor)
+            if rows:
+                return rows[0], True
+
+            cursor.execute(f"""
+                SELECT {JOB_COLUMNS}
+                FROM scoring_jobs
+                WHERE match_id = %s
+                  AND status IN ('queued', 'running')
+            """, [match_id])
+
+            rows = dictfetchall(cursor)
+            if rows:
+                return rows[0], False
+
+    raise RuntimeError(f"Could not queue scoring for match {match_id}")
+
+
+def get_job(job_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT {JOB_COLUMNS}
+            FROM scoring_jobs
+            WHERE job_id = %s
+        """, [job_id])
+
+        rows = dictfetchall(cursor)
+
+    return rows[0] if rows else None
+
+
+def claim_next_job():
+    """
+    Atomically take the oldest queued (or stale running) job.
+    Returns (job_id, match_id, last_user_id) or None.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE scoring_jobs
+            SET status = 'running',
+                started_at = COALESCE(started_at, NOW()),
+                updated_at = NOW()
+            WHERE job_id = (
+                SELECT job_id
+                FROM scoring_jobs
+                WHERE status = 'queued'
+                   OR (status = 'running'
+                       AND updated_at < NOW() - make_interval(secs => %s))
+                ORDER BY job_id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING job_id, match_id, last_user_id
+        """, [SCORING_JOB_STALE_SECONDS])
+
+        return cursor.fetchone()
+
+
+def run_scoring_job(job_id, match_id, last_user_id=0, chunk_size=None):
+    chunk_size = chunk_size or SCORING_CHUNK_SIZE
+
+    try:
+        # Scoring reads the frozen snapshot, which only exists once the match
+        # has started; take it now if the cron hasn't yet.
+        with connection.cursor() as cursor:
+            if not has_started(cursor, match_id):
+                raise ValueError(f"Match {match_id} has not started")
+
+        lock_matches([match_id])
+
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE scoring_jobs
+                SET teams_total = (
+                    SELECT COUNT(*) FROM fantasy_teams WHERE match_id = %s
+                )
+                WHERE job_id = %s
+            """, [match_id, job_id])
+
+        while True:
+            with transaction.atomic():
+                count, last = score_teams(match_id, last_user_id, chunk_size)
+                if not count:
+                    break
+
+                last_user_id = last
+                with connection.cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE scoring_jobs
+                        SET teams_done = teams_done + %s,
+                            last_user_id = %s,
+                            updated_at = NOW()
+                        WHERE job_id = %s
+                    """, [count, last_user_id, job_id])
+
+        with transaction.atomic():
+            update_match_ranks(match_id)
+            update_overall_leaderboard_for_match(match_id)
+            update_all_overall_ranks()
+
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE scoring_jobs
+                    SET status = 'done',
+                        finished_at = NOW(),
+                        updated_at = NOW()
+                    WHERE job_id = %s
+                """, [job_id])
+
+    except Exception as e:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE scoring_jobs
+                SET status = 'failed',
+                    error = %s,
+                    finished_at = NOW(),
+                    updated_at = NOW()
+                WHERE job_id = %s
+            """, [str(e), job_id])
+        raise
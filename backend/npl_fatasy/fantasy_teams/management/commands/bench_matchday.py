@@ -0,0 +1,379 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.operations.special import RunSQL
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from fantasy_teams.jobs import claim_next_job, run_scoring_job
+from fantasy_teams.scoring import score_match
+from fantasy_teams.views import calculate_match_results_api, select_players_api
+from leaderboard.views import (
+    matchday_leaderboard_api,
+    matchday_leaderboard_async_api,
+    overall_leaderboard_api,
+    overall_leaderboard_async_api,
+)
+from npl_fatasy import keys
+from npl_fatasy.adb import close_pools
+from npl_fatasy.schema import BASE_SCHEMA_SQL
+from player_stats.points import refresh_player_points
+
+
+# Match-day benchmark.
+#
+# Everything runs inside a throwaway schema on the configured Postgres
+# (search_path is pointed at it), so live tables are never read or
+# written. The base tables (npl_fatasy.schema) are created first because
+# they predate the repo's migrations; every RunSQL migration of the project
+# apps is then replayed on top, so the benchmark always sees the current
+# indexes and derived tables.
+BENCH_SCHEMA = "bench_npl"
+
+PROJECT_APPS = {
+    "teams", "players", "matches", "match_players", "users",
+    "fantasy_teams", "player_stats", "leaderboard",
+}
+
+# Two teams of 15; roles cycle BATTER/BOWLER/ALLROUNDER, every player costs 8.
+SEED_SQL = f"""
+    INSERT INTO teams (team_id, team_name, acronym)
+    VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB');
+
+    INSERT INTO players (player_id, player_name, role, cost, team_id)
+    SELECT
+        t.acronym || LPAD(i::text, 3, '0'),
+        t.team_name || ' ' || i,
+        (ARRAY['ALLROUNDER', 'BATTER', 'BOWLER'])[i %% 3 + 1],
+        8,
+        t.team_id
+    FROM teams t
+    CROSS JOIN generate_series(1, 15) i;
+
+    INSERT INTO matches (match_id, match_date, team_1, team_2)
+    VALUES (1, CURRENT_DATE, 1, 2), (2, CURRENT_DATE + 1, 1, 2);
+
+    INSERT INTO match_players (mp_id, match_id, player_id, is_playing)
+    SELECT {keys.mp_id_sql('m.match_id', 'p.player_id')}, m.match_id, p.player_id, TRUE
+    FROM matches m
+    CROSS JOIN players p;
+
+    INSERT INTO player_stats
+    (stat_id, mp_id, run_rate, econ, wickets, sixes, fours, catches, runs)
+    SELECT
+        {keys.stat_id_sql('mp.mp_id')}, mp.mp_id,
+        random() * 200, 4 + random() * 8,
+        (random() * 4)::int, (random() * 5)::int,
+        (random() * 8)::int, (random() * 2)::int, (random() * 80)::int
+    FROM match_players mp
+    WHERE mp.match_id = 1;
+
+    INSERT INTO users (user_id, username, password)
+    SELECT i, 'bench_user_' || i, 'x'
+    FROM generate_series(1, %(teams)s) i;
+
+    INSERT INTO fantasy_teams (fantasy_team_id, user_id, match_id, total_points)
+    SELECT {keys.fantasy_team_id_sql('i', '1')}, i, 1, 0
+    FROM generate_series(1, %(teams)s) i;
+
+    INSERT INTO fantasy_team_players
+    (fantasy_team_id, match_id, user_id, player_id, is_captain, is_vice_captain)
+    SELECT
+        ft.fantasy_team_id,
+        ft.match_id,
+        ft.user_id,
+        (CASE WHEN k < 4 THEN 'AAA' ELSE 'BBB' END)
+            || LPAD(((ft.user_id + k) %% 15 + 1)::text, 3, '0'),
+        k = 0,
+        k = 1
+    FROM fantasy_teams ft
+    CROSS JOIN generate_series(0, 6) k;
+"""
+
+# A valid 7-player pick for match 2 (4 + 3 players, at most 3 per role, cost 56).
+SAVE_PAYLOAD = {
+    "players": ["AAA001", "AAA002", "AAA003", "AAA004", "BBB001", "BBB002", "BBB003"],
+    "captain": "AAA001",
+    "vice_captain": "BBB001",
+}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[int(round(fraction * (len(sorted_values) - 1)))]
+
+
+def check(name, response):
+    if not 200 <= response.status_code < 300:
+        raise CommandError(f"{name}: HTTP {response.status_code} {response.content[:200]!r}")
+
+
+def summary(name, latencies, elapsed, **extra):
+    latencies.sort()
+
+    return {
+        "scenario": name,
+        "iterations": len(latencies),
+        **extra,
+        "throughput_per_s": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+def measure(name, call, iterations):
+    latencies = []
+    started = time.perf_counter()
+
+    for i in range(iterations):
+        t = time.perf_counter()
+        response = call(i)
+        latencies.append(time.perf_counter() - t)
+        check(name, response)
+
+    return summary(name, latencies, time.perf_counter() - started)
+
+
+def measure_threaded(name, call, iterations, threads):
+    """
+    Sync views as ASGI runs them: on a bounded thread pool, each request
+    holding its thread (and connection) until the query returns.
+    """
+    def one(i):
+        t = time.perf_counter()
+        try:
+            response = call(i)
+        finally:
+            # What request_finished does at the end of each request.
+            close_old_connections()
+        check(name, response)
+        return time.perf_counter() - t
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(one, range(iterations)))
+
+    return summary(name, latencies, time.perf_counter() - started, concurrency=threads)
+
+
+def measure_async(name, call, iterations, concurrency):
+    """
+    Async views on one event loop with up to `concurrency` requests in flight.
+    """
+    async def run():
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with gate:
+                t = time.perf_counter()
+                response = await call(i)
+                check(name, response)
+                return time.perf_counter() - t
+
+        try:
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(one(i) for i in range(iterations)))
+            return latencies, time.perf_counter() - started
+        finally:
+            await close_pools()
+
+    latencies, elapsed = asyncio.run(run())
+
+    return summary(name, list(latencies), elapsed, concurrency=concurrency)
+
+
+class Command(BaseCommand):
+    help = "Seed a throwaway schema with synthetic match-day data and benchmark the hot endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--teams", type=int, default=100_000, help="fantasy teams to seed")
+        parser.add_argument("--iterations", type=int, default=200, help="requests per scenario")
+        parser.add_argument("--output", help="write the JSON report to this file")
+        parser.add_argument("--keep", action="store_true", help="keep the bench schema afterwards")
+        parser.add_argument("--concurrency", type=int, default=50, help="requests in flight for the async scenarios")
+        parser.add_argument("--sync-threads", type=int, default=8, help="threads for the concurrent sync scenarios")
+        parser.add_argument(
+            "--yes-i-mean-it", action="store_true",
+            help="confirm that DATABASE_URL is a local database the bench may load and drop a schema in",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("bench_matchday needs a PostgreSQL database")
+
+        if not options["yes_i_mean_it"]:
+            db = connection.settings_dict
+            raise CommandError(
+                f"bench_matchday seeds and then drops schema {BENCH_SCHEMA} in "
+                f"{db['NAME']} on {db['HOST'] or 'localhost'} and puts load on it. "
+                "Run it only against a local database, with --yes-i-mean-it."
+            )
+
+        # Every connection opened from here on (threads, pools, the async
+        # driver) starts in the bench schema.
+        pgoptions = os.environ.get("PGOPTIONS")
+        os.environ["PGOPTIONS"] = f"-c search_path={BENCH_SCHEMA}"
+
+        self.setup_schema(options["teams"])
+        try:
+            results = self.run_scenarios(options["teams"], options["iterations"])
+            results += self.run_concurrent_scenarios(
+                options["teams"], options["iterations"],
+                options["sync_threads"], options["concurrency"],
+            )
+            report = {"teams": options["teams"], "results": results}
+        finally:
+            if not options["keep"]:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+                    cursor.execute("RESET search_path")
+            if pgoptions is None:
+                os.environ.pop("PGOPTIONS", None)
+            else:
+                os.environ["PGOPTIONS"] = pgoptions
+
+        body = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(body + "\n")
+        self.stdout.write(body)
+
+    def setup_schema(self, teams):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+            cursor.execute(f"SET search_path TO {BENCH_SCHEMA}")
+            cursor.execute(BASE_SCHEMA_SQL)
+
+            loader = MigrationLoader(None, ignore_no_migrations=True)
+            for key in self.project_migration_plan(loader):
+                for operation in loader.graph.nodes[key].operations:
+                    if isinstance(operation, RunSQL):
+                        cursor.execute(operation.sql)
+
+            cursor.execute(SEED_SQL, {"teams": teams})
+
+        refresh_player_points()
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def project_migration_plan(self, loader):
+        plan = []
+        for leaf in loader.graph.leaf_nodes():
+            if leaf[0] not in PROJECT_APPS:
+                continue
+            for key in loader.graph.forwards_plan(leaf):
+                if key[0] in PROJECT_APPS and key not in plan:
+                    plan.append(key)
+        return plan
+
+    def run_scenarios(self, teams, iterations):
+        factory = RequestFactory()
+        body = json.dumps(SAVE_PAYLOAD)
+
+        def save(i):
+            request = factory.post("/fantasy/select/2/", body, content_type="application/json")
+            request.session = {"user_id": i % teams + 1}
+            return select_players_api(request, 2)
+
+        def calculate(i):
+            # Enqueue through the endpoint, then drain the job in-process.
+            request = factory.post("/fantasy/calculate/1/")
+            request.user = User(username="bench", is_superuser=True)
+            response = calculate_match_results_api(request, 1)
+            run_scoring_job(*claim_next_job())
+            return response
+
+        def score_single_pass(i):
+            score_match(1)
+            return HttpResponse()
+
+        def overall_first(i):
+            return overall_leaderboard_api(factory.get("/leaderboard/api/overall/"))
+
+        def matchday_first(i):
+            return matchday_leaderboard_api(factory.get("/leaderboard/api/match/1/"), 1)
+
+        results = [
+            measure("select_players_api save", save, iterations),
+            measure("calculate_match_results_api + scoring job", calculate, max(1, iterations // 50)),
+            measure("score_match single pass", score_single_pass, max(1, iterations // 50)),
+            measure("overall_leaderboard_api page 1", overall_first, iterations),
+            measure("matchday_leaderboard_api page 1", matchday_first, iterations),
+        ]
+
+        # Deep pages: start from the row half-way down each board.
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT rank, user_id FROM overall_leaderboard
+                ORDER BY rank, user_id OFFSET %s LIMIT 1
+            """, [teams // 2])
+            overall_mid = cursor.fetchone()
+
+            cursor.execute("""
+                SELECT total_points, user_id FROM fantasy_teams
+                WHERE match_id = 1
+                ORDER BY total_points DESC, user_id OFFSET %s LIMIT 1
+            """, [teams // 2])
+            matchday_mid = cursor.fetchone()
+
+        def overall_deep(i):
+            return overall_leaderboard_api(factory.get("/leaderboard/api/overall/", {
+                "after_rank": overall_mid[0], "after_user_id": overall_mid[1],
+            }))
+
+        def matchday_deep(i):
+            return matchday_leaderboard_api(factory.get("/leaderboard/api/match/1/", {
+                "after_points": matchday_mid[0], "after_user_id": matchday_mid[1],
+            }), 1)
+
+        results += [
+            measure("overall_leaderboard_api deep keyset page", overall_deep, iterations),
+            measure("matchday_leaderboard_api deep keyset page", matchday_deep, iterations),
+        ]
+
+        return results
+
+    def run_concurrent_scenarios(self, teams, iterations, threads, concurrency):
+        """
+        The same leaderboard pages under concurrency: sync views on a
+        thread pool against their async variants on one event loop.
+        """
+        factory = RequestFactory()
+        iterations = max(iterations, concurrency)
+        def overall_request(i):
+            return factory.get("/leaderboard/api/overall/")
+
+        def matchday_request(i):
+            return factory.get("/leaderboard/api/match/1/")
+
+        return [
+            measure_threaded(
+                "overall_leaderboard_api page 1 (sync, threads)",
+                lambda i: overall_leaderboard_api(overall_request(i)),
+                iterations, threads,
+            ),
+            measure_async(
+                "overall_leaderboard_async_api page 1 (async)",
+                lambda i: overall_leaderboard_async_api(overall_request(i)),
+                iterations, concurrency,
+            ),
+            measure_threaded(
+                "matchday_leaderboard_api page 1 (sync, threads)",
+                lambda i: matchday_leaderboard_api(matchday_request(i), 1),
+                iterations, threads,
+            ),
+            measure_async(
+                "matchday_leaderboard_async_api page 1 (async)",
+                lambda i: matchday_leaderboard_async_api(matchday_request(i), 1),
+                iterations, concurrency,
+            ),
+        ]
@@ -0,0 +1,59 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from npl_fatasy.pooling import pool_stats, pooled_aliases
+
+
+class Command(BaseCommand):
+    help = "Run concurrent queries through each pooled DB alias and print the pool's stats."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=20, help="concurrent threads")
+        parser.add_argument("--queries", type=int, default=200, help="queries per alias")
+        parser.add_argument("--sleep", type=float, default=0.01, help="seconds each query holds its connection")
+
+    def handle(self, *args, **options):
+        aliases = pooled_aliases()
+        if not aliases:
+            raise CommandError("No pooled database: set DB_POOL=true and use PostgreSQL")
+
+        report = {}
+        for alias in aliases:
+            report[alias] = self.exercise(alias, options["workers"], options["queries"], options["sleep"])
+
+        self.stdout.write(json.dumps(report, indent=2, default=str))
+
+    def exercise(self, alias, workers, queries, sleep):
+        def query(i):
+            conn = connections[alias]
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_backend_pid(), pg_sleep(%s)", [sleep])
+                    return cursor.fetchone()[0]
+            finally:
+                # Hand the connection back to the pool, as the end of a request does.
+                conn.close()
+
+        pool_stats(reset=True)
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            backends = set(executor.map(query, range(queries)))
+
+        elapsed = time.perf_counter() - started
+        pool = connections[alias].pool
+
+        return {
+            "queries": queries,
+            "workers": workers,
+            "elapsed_s": round(elapsed, 3),
+            # At most max_size server backends, however many threads asked.
+            "distinct_backends": len(backends),
+            "min_size": pool.min_size,
+            "max_size": pool.max_size,
+            "stats": pool.get_stats(),
+        }
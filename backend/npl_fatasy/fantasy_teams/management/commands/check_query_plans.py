@@ -0,0 +1,86 @@
+import json
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from fantasy_teams.catalog import SQUAD_SQL
+from fantasy_teams.ownership import OWNERSHIP_SQL
+from fantasy_teams.views import (
+    FANTASY_TEAM_SQL,
+    LIVE_RESULTS_SQL,
+    RESULTS_SQL,
+    TEAM_PICKS_SQL,
+)
+from leaderboard.views import (
+    MATCHDAY_ABOVE_SQL,
+    MATCHDAY_AFTER_SQL,
+    MATCHDAY_BELOW_SQL,
+    MATCHDAY_FIRST_PAGE_SQL,
+    OVERALL_AFTER_SQL,
+    OVERALL_FIRST_PAGE_SQL,
+)
+from players.views import PLAYERS_BY_TEAM_SQL
+
+
+# The views' own selective queries, imported rather than copied so the check
+# can't drift from what actually runs, with representative parameters.
+# Full-list reads such as the match list are left out. Sequential scans are
+# disabled while planning, so the planner only falls back to one when no
+# usable index exists at all; that keeps the check meaningful on a small
+# development database.
+POINTS = Decimal("100.00")
+
+HOT_QUERIES = [
+    ("overall leaderboard first page", OVERALL_FIRST_PAGE_SQL, [100, 0]),
+    ("overall leaderboard page", OVERALL_AFTER_SQL, [1, 0, 100]),
+    ("matchday leaderboard first page", MATCHDAY_FIRST_PAGE_SQL, [1, 100, 0]),
+    ("matchday leaderboard page", MATCHDAY_AFTER_SQL, [1, POINTS, POINTS, 0, 100]),
+    ("matchday teams above me", MATCHDAY_ABOVE_SQL, [1, POINTS, POINTS, 1, 10]),
+    ("matchday teams below me", MATCHDAY_BELOW_SQL, [1, POINTS, POINTS, 1, 10]),
+    ("match squad", SQUAD_SQL, [1, 1]),
+    ("players by acronym", PLAYERS_BY_TEAM_SQL, ["ABC"]),
+    ("team picks", TEAM_PICKS_SQL, [1, 1]),
+    ("fantasy team", FANTASY_TEAM_SQL, [1, 1]),
+    ("match ownership", OWNERSHIP_SQL, [1]),
+    ("frozen team results", RESULTS_SQL, [1, 1]),
+    ("live team results", LIVE_RESULTS_SQL, [1, 1, 1]),
+]
+
+
+def seq_scans(plan):
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan.get("Relation Name")
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child)
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN every hot query and fail if any of them needs a sequential scan."
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("check_query_plans needs a PostgreSQL database")
+
+        failures = []
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for name, sql, params in HOT_QUERIES:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+
+                tables = sorted(set(seq_scans(plan[0]["Plan"])))
+                if tables:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(
+                        f"SEQ SCAN  {name}: {', '.join(tables)}"
+                    ))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"ok        {name}"))
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries fall back to a sequential scan")
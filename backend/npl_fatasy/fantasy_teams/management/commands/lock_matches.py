@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from fantasy_teams.deadline import lock_match, lock_started_matches
+
+
+class Command(BaseCommand):
+    help = "Freeze the fantasy teams of every started match (see fantasy_teams.deadline). Run every minute."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--match", type=int, help="lock this match now, whatever its date")
+
+    def handle(self, *args, **options):
+        if options["match"] is not None:
+            teams = lock_match(options["match"])
+            locked = [] if teams is None else [(options["match"], teams)]
+        else:
+            locked = lock_started_matches()
+
+        for match_id, teams in locked:
+            self.stdout.write(f"match {match_id}: {teams} teams frozen")
+
+        if not locked:
+            self.stdout.write("nothing to lock")
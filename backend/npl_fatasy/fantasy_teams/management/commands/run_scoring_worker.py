@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from fantasy_teams.jobs import claim_next_job, run_scoring_job
+
+
+class Command(BaseCommand):
+    help = "Process queued scoring jobs (see fantasy_teams.jobs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+        parser.add_argument("--poll", type=float, default=2.0, help="seconds between queue polls")
+        parser.add_argument("--chunk-size", type=int, help="teams scored per transaction")
+
+    def handle(self, *args, **options):
+        while True:
+            # Long-running process: drop connections that are broken or past
+            # CONN_MAX_AGE (or hand them back to the pool) between jobs, as
+            # Django does between requests.
+            close_old_connections()
+
+            job = None
+            started = time.perf_counter()
+            try:
+                job = claim_next_job()
+
+                if job is not None:
+                    job_id, match_id, last_user_id = job
+                    self.stdout.write(f"job {job_id}: scoring match {match_id}")
+                    run_scoring_job(job_id, match_id, last_user_id, options["chunk_size"])
+            except Exception as e:
+                if job is None:
+                    self.stderr.write(self.style.ERROR(f"claiming a job failed: {e}"))
+                    time.sleep(options["poll"])
+                else:
+                    self.stderr.write(self.style.ERROR(f"job {job[0]} failed: {e}"))
+                continue
+
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll"])
+                continue
+
+            self.stdout.write(self.style.SUCCESS(
+                f"job {job[0]} done in {time.perf_counter() - started:.1f}s"
+            ))
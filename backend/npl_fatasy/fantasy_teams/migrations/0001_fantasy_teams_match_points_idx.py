@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS fantasy_teams_match_points_idx
+                    ON fantasy_teams (match_id, total_points DESC, user_id);
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS fantasy_teams_match_points_idx;",
+        ),
+    ]
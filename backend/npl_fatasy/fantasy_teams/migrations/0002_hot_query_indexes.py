@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("fantasy_teams", "0001_fantasy_teams_match_points_idx"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS fantasy_teams_user_match_key
+                    ON fantasy_teams (user_id, match_id);
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS fantasy_teams_user_match_key;",
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS fantasy_team_players_team_player_key
+                    ON fantasy_team_players (fantasy_team_id, player_id);
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS fantasy_team_players_team_player_key;",
+        ),
+    ]
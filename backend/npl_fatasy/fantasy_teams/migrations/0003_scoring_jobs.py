@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fantasy_teams", "0002_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS scoring_jobs (
+                    job_id BIGSERIAL PRIMARY KEY,
+                    match_id INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    teams_total INTEGER,
+                    teams_done INTEGER NOT NULL DEFAULT 0,
+                    last_user_id INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    started_at TIMESTAMPTZ,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    finished_at TIMESTAMPTZ
+                );
+                -- At most one live job per match: re-enqueueing returns it.
+                CREATE UNIQUE INDEX IF NOT EXISTS scoring_jobs_active_match_key
+                    ON scoring_jobs (match_id)
+                    WHERE status IN ('queued', 'running');
+                CREATE INDEX IF NOT EXISTS scoring_jobs_queued_idx
+                    ON scoring_jobs (job_id)
+                    WHERE status IN ('queued', 'running');
+            """,
+            reverse_sql="DROP TABLE IF EXISTS scoring_jobs;",
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("fantasy_teams", "0003_scoring_jobs"),
+    ]
+
+    operations = [
+        # Reverse lookup player -> fantasy teams, for incremental rescoring.
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS fantasy_team_players_player_idx
+                    ON fantasy_team_players (player_id, fantasy_team_id);
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS fantasy_team_players_player_idx;",
+        ),
+    ]
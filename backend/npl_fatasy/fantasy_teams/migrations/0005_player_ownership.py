@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fantasy_teams", "0004_fantasy_team_players_player_idx"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS player_ownership (
+                    match_id INTEGER NOT NULL,
+                    player_id TEXT NOT NULL,
+                    picks INTEGER NOT NULL DEFAULT 0,
+                    captain_picks INTEGER NOT NULL DEFAULT 0,
+                    vice_captain_picks INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (match_id, player_id)
+                );
+
+                INSERT INTO player_ownership
+                (match_id, player_id, picks, captain_picks, vice_captain_picks)
+                SELECT
+                    ft.match_id,
+                    ftp.player_id,
+                    COUNT(*),
+                    COUNT(*) FILTER (WHERE ftp.is_captain),
+                    COUNT(*) FILTER (WHERE ftp.is_vice_captain)
+                FROM fantasy_team_players ftp
+                JOIN fantasy_teams ft ON ft.fantasy_team_id = ftp.fantasy_team_id
+                GROUP BY ft.match_id, ftp.player_id
+                ON CONFLICT (match_id, player_id) DO NOTHING;
+            """,
+            reverse_sql="DROP TABLE IF EXISTS player_ownership;",
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fantasy_teams", "0005_player_ownership"),
+    ]
+
+    operations = [
+        # Step 1 of moving off the "{user_id}_{match_id}" text key: carry the
+        # integer key parts on every pick. Writers fill both from now on;
+        # NOT NULL and dropping the text key come once no old writer remains.
+        migrations.RunSQL(
+            sql="""
+                ALTER TABLE fantasy_team_players
+                    ADD COLUMN IF NOT EXISTS match_id INTEGER,
+                    ADD COLUMN IF NOT EXISTS user_id INTEGER;
+
+                UPDATE fantasy_team_players ftp
+                SET match_id = ft.match_id,
+                    user_id = ft.user_id
+                FROM fantasy_teams ft
+                WHERE ft.fantasy_team_id = ftp.fantasy_team_id
+                  AND (ftp.match_id IS NULL OR ftp.user_id IS NULL);
+            """,
+            reverse_sql="""
+                ALTER TABLE fantasy_team_players
+                    DROP COLUMN IF EXISTS match_id,
+                    DROP COLUMN IF EXISTS user_id;
+            """,
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("fantasy_teams", "0006_fantasy_team_players_structured_keys"),
+    ]
+
+    operations = [
+        # A match's picks are now one contiguous index range.
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS fantasy_team_players_match_user_idx
+                    ON fantasy_team_players (match_id, user_id);
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS fantasy_team_players_match_user_idx;",
+        ),
+        # Per-match reverse index player -> teams; replaces the season-wide
+        # (player_id, fantasy_team_id) index used by incremental rescoring.
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS fantasy_team_players_match_player_idx
+                    ON fantasy_team_players (match_id, player_id);
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS fantasy_team_players_match_player_idx;",
+        ),
+        migrations.RunSQL(
+            sql="DROP INDEX CONCURRENTLY IF EXISTS fantasy_team_players_player_idx;",
+            reverse_sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS fantasy_team_players_player_idx
+                    ON fantasy_team_players (player_id, fantasy_team_id);
+            """,
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fantasy_teams", "0007_structured_key_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                -- One row per match once its teams are frozen.
+                CREATE TABLE IF NOT EXISTS match_locks (
+                    match_id INTEGER PRIMARY KEY,
+                    teams INTEGER NOT NULL DEFAULT 0,
+                    locked_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+
+                -- Frozen picks, written once per match in (user_id, player_id)
+                -- order and never updated, so pages are packed full.
+                CREATE TABLE IF NOT EXISTS fantasy_team_snapshots (
+                    match_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    player_id TEXT NOT NULL,
+                    multiplier NUMERIC(2, 1) NOT NULL,
+                    PRIMARY KEY (match_id, user_id, player_id)
+                ) WITH (fillfactor = 100);
+
+                CREATE INDEX IF NOT EXISTS fantasy_team_snapshots_match_player_idx
+                    ON fantasy_team_snapshots (match_id, player_id);
+            """,
+            reverse_sql="""
+                DROP TABLE IF EXISTS fantasy_team_snapshots;
+                DROP TABLE IF EXISTS match_locks;
+            """,
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fantasy_teams", "0008_team_snapshots"),
+    ]
+
+    operations = [
+        # Position of the team on its matchday board (ROW_NUMBER over
+        # total_points DESC, user_id), re-snapshotted whenever the match is
+        # scored, so "around me" reads a rank instead of counting rows.
+        migrations.RunSQL(
+            sql="""
+                ALTER TABLE fantasy_teams
+                    ADD COLUMN IF NOT EXISTS match_rank INTEGER;
+
+                UPDATE fantasy_teams ft
+                SET match_rank = ranked.match_rank
+                FROM (
+                    SELECT
+                        fantasy_team_id,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY match_id
+                            ORDER BY total_points DESC, user_id
+                        ) AS match_rank
+                    FROM fantasy_teams
+                ) ranked
+                WHERE ft.fantasy_team_id = ranked.fantasy_team_id;
+            """,
+            reverse_sql="ALTER TABLE fantasy_teams DROP COLUMN IF EXISTS match_rank;",
+        ),
+    ]
@@ -0,0 +1,79 @@
+from django.db import connection
+
+from npl_fatasy.db import dictfetchall
+
+
+# player_ownership keeps, per (match_id, player_id), how many fantasy teams
+# picked the player and how many made them captain / vice-captain. It is
+# adjusted by the difference between a team's old and new picks inside the
+# same transaction as the save. Every team has exactly one captain, so the
+# number of teams in a match is SUM(captain_picks) over its ~30 rows.
+
+
+def pick_counts(picks):
+    """
+    {player_id: (picks, captain_picks, vice_captain_picks)} for one team's rows.
+    """
+    return {
+        p["player_id"]: (1, int(p["is_captain"]), int(p["is_vice_captain"]))
+        for p in picks
+    }
+
+
+def apply_ownership_change(cursor, match_id, old_picks, new_picks):
+    """
+    Move player_ownership from one team's old picks to its new picks.
+    """
+    old = pick_counts(old_picks)
+    new = pick_counts(new_picks)
+
+    values = []
+    params = []
+    # Sorted so concurrent saves lock popular players' rows in the same order.
+    for player_id in sorted(old.keys() | new.keys()):
+        before = old.get(player_id, (0, 0, 0))
+        after = new.get(player_id, (0, 0, 0))
+        delta = [a - b for a, b in zip(after, before)]
+        if any(delta):
+            values.append("(%s, %s, %s, %s, %s)")
+            params += [match_id, player_id, *delta]
+
+    if not values:
+        return
+
+    cursor.execute(f"""
+        INSERT INTO player_ownership
+        (match_id, player_id, picks, captain_picks, vice_captain_picks)
+        VALUES {", ".join(values)}
+        ON CONFLICT (match_id, player_id) DO UPDATE
+        SET picks = player_ownership.picks + EXCLUDED.picks,
+            captain_picks = player_ownership.captain_picks + EXCLUDED.captain_picks,
+            vice_captain_picks = player_ownership.vice_captain_picks + EXCLUDED.vice_captain_picks
+    """, params)
+
+
+OWNERSHIP_SQL = """
+    SELECT player_id, picks, captain_picks, vice_captain_picks
+    FROM player_ownership
+    WHERE match_id = %s
+    ORDER BY picks DESC, player_id
+"""
+
+
+def match_ownership(match_id):
+    with connection.cursor() as cursor:
+        cursor.execute(OWNERSHIP_SQL, [match_id])
+
+        players = dictfetchall(cursor)
+
+    teams = sum(p["captain_picks"] for p in players)
+
+    for p in players:
+        for field, pct in (
+            ("picks", "pick_pct"),
+            ("captain_picks", "captain_pct"),
+            ("vice_captain_picks", "vice_captain_pct"),
+        ):
+            p[pct] = round(p[field] * 100 / teams, 2) if teams else 0
+
+    return teams, players
@@ -0,0 +1,165 @@
+import time
+
+from django.db import connection, transaction
+
+from leaderboard.standings import (
+    update_all_overall_ranks,
+    update_match_ranks,
+    update_overall_leaderboard_for_match,
+    update_overall_leaderboard_for_users,
+)
+from .deadline import lock_matches
+
+
+def score_teams(match_id, after_user_id=0, limit=None):
+    """
+    Score the match's fantasy teams with user_id > after_user_id, in user_id
+    order, at most `limit` of them (all when limit is None), from the
+    match's frozen snapshot (see fantasy_teams.deadline).
+
+    Returns (teams_scored, last_user_id).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            WITH chunk AS (
+                SELECT fantasy_team_id, user_id
+                FROM fantasy_teams
+                WHERE match_id = %s
+                  AND user_id > %s
+                ORDER BY user_id
+                LIMIT %s
+            ),
+            scored AS (
+                SELECT
+                    c.fantasy_team_id,
+                    ROUND(COALESCE(SUM(
+                        pmp.base_points * s.multiplier
+                    ), 0)::numeric, 2) AS total_points
+                FROM chunk c
+                LEFT JOIN fantasy_team_snapshots s
+                    ON s.match_id = %s
+                   AND s.user_id = c.user_id
+                LEFT JOIN player_match_points pmp
+                    ON pmp.player_id = s.player_id
+                   AND pmp.match_id = %s
+                GROUP BY c.fantasy_team_id
+            ),
+            updated AS (
+                UPDATE fantasy_teams ft
+                SET total_points = scored.total_points
+                FROM scored
+                WHERE ft.fantasy_team_id = scored.fantasy_team_id
+                RETURNING ft.user_id
+            )
+            SELECT COUNT(*), MAX(user_id) FROM updated
+        """, [match_id, after_user_id, limit, match_id, match_id])
+
+        count, last_user_id = cursor.fetchone()
+
+    return count, last_user_id
+
+
+def score_match(match_id):
+    """
+    Score every fantasy team of a match in one set-based UPDATE and
+    refresh the overall leaderboard in the same transaction.
+
+    Returns a dict with the number of teams updated and timings in ms.
+    """
+    started = time.perf_counter()
+
+    lock_matches([match_id])
+
+    with transaction.atomic():
+        teams_processed, _ = score_teams(match_id)
+        update_match_ranks(match_id)
+
+        scored_at = time.perf_counter()
+
+        users_updated = update_overall_leaderboard_for_match(match_id)
+        update_all_overall_ranks()
+
+    finished = time.perf_counter()
+
+    return {
+        "teams_processed": teams_processed,
+        "users_updated": users_updated,
+        "timings_ms": {
+            "scoring": round((scored_at - started) * 1000, 2),
+            "leaderboard": round((finished - scored_at) * 1000, 2),
+            "total": round((finished - started) * 1000, 2),
+        },
+    }
+
+
+def rescore_players(mp_ids):
+    """
+    Re-score only the fantasy teams that picked one of the given match players
+    and recompute their users' overall totals.
+
+    Teams are found through fantasy_team_snapshots_match_player_idx, so the
+    cost is proportional to the teams affected, not to the size of the match.
+    Only locked matches have snapshots; the others are scored by their job.
+    Ranks are left to the scoring job (see fantasy_teams.jobs), which the
+    caller queues for the returned matches.
+
+    Returns (teams_rescored, users_updated, match_ids).
+    """
+    if not mp_ids:
+        return 0, 0, []
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Lock the teams before reading them so concurrent saves (or a
+            # job scoring the same match) queue up instead of interleaving.
+            cursor.execute("""
+                SELECT ft.fantasy_team_id
+                FROM player_match_points changed
+                JOIN fantasy_team_snapshots hit
+                    ON hit.match_id = changed.match_id
+                   AND hit.player_id = changed.player_id
+                JOIN fantasy_teams ft
+                    ON ft.user_id = hit.user_id
+                   AND ft.match_id = hit.match_id
+                WHERE changed.mp_id = ANY(%s)
+                ORDER BY ft.fantasy_team_id
+                FOR UPDATE OF ft
+            """, [list(mp_ids)])
+
+            team_ids = list({row[0] for row in cursor.fetchall()})
+
+            if not team_ids:
+                return 0, 0, []
+
+            cursor.execute("""
+                WITH scored AS (
+                    SELECT
+                        ft.fantasy_team_id,
+                        ROUND(COALESCE(SUM(
+                            pmp.base_points * s.multiplier
+                        ), 0)::numeric, 2) AS total_points
+                    FROM fantasy_teams ft
+                    LEFT JOIN fantasy_team_snapshots s
+                        ON s.match_id = ft.match_id
+                       AND s.user_id = ft.user_id
+                    LEFT JOIN player_match_points pmp
+                        ON pmp.player_id = s.player_id
+                       AND pmp.match_id = ft.match_id
+                    WHERE ft.fantasy_team_id = ANY(%s)
+                    GROUP BY ft.fantasy_team_id
+                )
+                UPDATE fantasy_teams ft
+                SET total_points = s.total_points
+                FROM scored s
+                WHERE ft.fantasy_team_id = s.fantasy_team_id
+                  AND ft.total_points IS DISTINCT FROM s.total_points
+                RETURNING ft.user_id, ft.match_id
+            """, [team_ids])
+
+            updated = cursor.fetchall()
+
+        users_updated = update_overall_leaderboard_for_users(
+            sorted({user_id for user_id, _ in updated})
+        )
+
+    return len(updated), users_updated, sorted({match_id for _, match_id in updated})
@@ -1,3 +1,437 @@
-from django.test import TestCase
+import json
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import RequestFactory, TestCase
+
+from admin_panel.views import add_player_api
+from npl_fatasy import keys
+from .catalog import get_squad, invalidate_squads
+from .deadline import lock_match
+from .jobs import claim_next_job, enqueue_scoring_job, get_job, run_scoring_job
+from .views import (
+    calculate_match_results_api,
+    create_fantasy_team,
+    ownership_api,
+    select_players_api,
+)
+
+
+OPEN_MATCH = 1
+STARTED_MATCH = 2
+
+# 4 + 3 players, at most 3 per role, cost 56.
+PICKS = ["AAA001", "AAA002", "AAA003", "AAA004", "BBB001", "BBB002", "BBB003"]
+
+
+def seed():
+    """
+    Two teams of 6 (roles cycle BATTER/BOWLER/ALLROUNDER, cost 8), a match
+    that starts tomorrow, one that started yesterday, and three users.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO teams (team_id, team_name, acronym)
+            VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB');
+
+            INSERT INTO players (player_id, player_name, role, cost, team_id)
+            SELECT
+                t.acronym || LPAD(i::text, 3, '0'),
+                t.team_name || ' ' || i,
+                (ARRAY['ALLROUNDER', 'BATTER', 'BOWLER'])[i %% 3 + 1],
+                8,
+                t.team_id
+            FROM teams t
+            CROSS JOIN generate_series(1, 6) i;
+
+            INSERT INTO matches (match_id, match_date, team_1, team_2)
+            VALUES (%s, CURRENT_DATE + 1, 1, 2), (%s, CURRENT_DATE - 1, 1, 2);
+
+            INSERT INTO match_players (mp_id, match_id, player_id, is_playing)
+            SELECT m.match_id || '_' || p.player_id, m.match_id, p.player_id, TRUE
+            FROM matches m
+            CROSS JOIN players p;
+
+            INSERT INTO users (user_id, username, password)
+            SELECT i, 'user' || i, 'x' FROM generate_series(1, 3) i;
+        """, [OPEN_MATCH, STARTED_MATCH])
+
+
+def insert_team(match_id, user_id, picks, captain, vice_captain):
+    # Straight into the tables, bypassing the deadline, for started matches.
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO fantasy_teams (fantasy_team_id, user_id, match_id, total_points)
+            VALUES (%s, %s, %s, 0)
+        """, [keys.fantasy_team_id(user_id, match_id), user_id, match_id])
+
+        for player_id in picks:
+            cursor.execute("""
+                INSERT INTO fantasy_team_players
+                (fantasy_team_id, match_id, user_id, player_id, is_captain, is_vice_captain)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, [
+                keys.fantasy_team_id(user_id, match_id), match_id, user_id,
+                player_id, player_id == captain, player_id == vice_captain,
+            ])
+
+
+def fetch(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+class TeamSelectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed()
+
+    def setUp(self):
+        invalidate_squads()
+        self.factory = RequestFactory()
+
+    def save(self, match_id, user_id, picks, captain, vice_captain):
+        request = self.factory.post(
+            f"/fantasy/select/{match_id}/",
+            json.dumps({"players": picks, "captain": captain, "vice_captain": vice_captain}),
+            content_type="application/json",
+        )
+        request.session = {"user_id": user_id}
+        return select_players_api(request, match_id)
+
+    def test_resave_replaces_picks(self):
+        self.assertEqual(self.save(OPEN_MATCH, 1, PICKS, "AAA001", "BBB001").status_code, 200)
+
+        changed = PICKS[:-1] + ["BBB006"]
+        self.assertEqual(self.save(OPEN_MATCH, 1, changed, "AAA003", "BBB006").status_code, 200)
+
+        self.assertEqual(fetch("""
+            SELECT COUNT(*) FROM fantasy_teams WHERE match_id = %s AND user_id = 1
+        """, [OPEN_MATCH]), [(1,)])
+        self.assertEqual(fetch("""
+            SELECT player_id, is_captain, is_vice_captain
+            FROM fantasy_team_players
+            WHERE match_id = %s AND user_id = 1
+            ORDER BY player_id
+        """, [OPEN_MATCH]), [
+            (player_id, player_id == "AAA003", player_id == "BBB006")
+            for player_id in sorted(changed)
+        ])
+
+    def test_invalid_selection_writes_nothing(self):
+        self.save(OPEN_MATCH, 1, PICKS, "AAA001", "BBB001")
+
+        five_alphas = ["AAA001", "AAA002", "AAA003", "AAA004", "AAA005", "BBB001", "BBB002"]
+        response = self.save(OPEN_MATCH, 1, five_alphas, "AAA005", "BBB001")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {"error": "Max 4 players per team"})
+        self.assertEqual(fetch("""
+            SELECT player_id FROM fantasy_team_players
+            WHERE match_id = %s AND user_id = 1
+            ORDER BY player_id
+        """, [OPEN_MATCH]), [(player_id,) for player_id in sorted(PICKS)])
+
+    def ownership(self, match_id):
+        return {
+            player_id: (picks, captains, vice_captains)
+            for player_id, picks, captains, vice_captains in fetch("""
+                SELECT player_id, picks, captain_picks, vice_captain_picks
+                FROM player_ownership
+                WHERE match_id = %s
+            """, [match_id])
+        }
+
+    def test_resave_moves_ownership(self):
+        self.save(OPEN_MATCH, 1, PICKS, "AAA001", "BBB001")
+        self.save(OPEN_MATCH, 2, PICKS, "AAA002", "BBB001")
+
+        changed = PICKS[:-1] + ["BBB006"]
+        self.save(OPEN_MATCH, 1, changed, "AAA003", "BBB006")
+
+        ownership = self.ownership(OPEN_MATCH)
+        self.assertEqual(ownership["AAA001"], (2, 0, 0))
+        self.assertEqual(ownership["AAA002"], (2, 1, 0))
+        self.assertEqual(ownership["AAA003"], (2, 1, 0))
+        self.assertEqual(ownership["BBB001"], (2, 0, 1))
+        self.assertEqual(ownership["BBB003"], (1, 0, 0))
+        self.assertEqual(ownership["BBB006"], (1, 0, 1))
+
+        # A rejected save leaves the counts alone.
+        self.save(OPEN_MATCH, 1, PICKS[:-1] + ["AAA005"], "AAA005", "BBB001")
+        self.assertEqual(self.ownership(OPEN_MATCH), ownership)
+
+    def test_ownership_api_reports_percentages(self):
+        self.save(OPEN_MATCH, 1, PICKS, "AAA001", "BBB001")
+        self.save(OPEN_MATCH, 2, PICKS[:-1] + ["BBB006"], "AAA002", "BBB001")
+
+        body = json.loads(ownership_api(self.factory.get("/"), OPEN_MATCH).content)
+        players = {p["player_id"]: p for p in body["players"]}
+
+        self.assertEqual(body["teams"], 2)
+        self.assertEqual(body["players"][0]["player_id"], "AAA001")
+        self.assertEqual(
+            (players["AAA001"]["pick_pct"], players["AAA001"]["captain_pct"]), (100, 50)
+        )
+        self.assertEqual(
+            (players["BBB006"]["pick_pct"], players["BBB001"]["vice_captain_pct"]), (50, 100)
+        )
+
+
+    def test_save_after_match_start_is_rejected(self):
+        response = self.save(STARTED_MATCH, 1, PICKS, "AAA001", "BBB001")
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(fetch("SELECT COUNT(*) FROM fantasy_teams"), [(0,)])
+        self.assertEqual(fetch("SELECT COUNT(*) FROM fantasy_team_players"), [(0,)])
+
+    def test_save_after_lock_is_rejected(self):
+        self.save(OPEN_MATCH, 1, PICKS, "AAA001", "BBB001")
+        lock_match(OPEN_MATCH)
+
+        response = self.save(OPEN_MATCH, 1, PICKS, "AAA002", "BBB001")
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(fetch("""
+            SELECT player_id FROM fantasy_team_players
+            WHERE match_id = %s AND user_id = 1 AND is_captain
+        """, [OPEN_MATCH]), [("AAA001",)])
+
+    def test_lock_freezes_picks_with_multipliers(self):
+        self.save(OPEN_MATCH, 1, PICKS, "AAA001", "BBB001")
+
+        self.assertEqual(lock_match(OPEN_MATCH), 1)
+        self.assertIsNone(lock_match(OPEN_MATCH))
+
+        multipliers = dict(fetch("""
+            SELECT player_id, multiplier FROM fantasy_team_snapshots
+            WHERE match_id = %s AND user_id = 1
+        """, [OPEN_MATCH]))
+        self.assertEqual(len(multipliers), 7)
+        self.assertEqual(multipliers["AAA001"], 2)
+        self.assertEqual(multipliers["BBB001"], 1.5)
+        self.assertEqual(multipliers["AAA002"], 1)
+
+    def test_create_team_only_before_the_deadline(self):
+        def create(match_id):
+            request = self.factory.post(f"/fantasy/create/{match_id}/")
+            request.session = {"user_id": 1}
+            return create_fantasy_team(request, match_id)
+
+        self.assertEqual(json.loads(create(OPEN_MATCH).content), {"status": "created"})
+        self.assertEqual(json.loads(create(OPEN_MATCH).content), {"status": "exists"})
+        self.assertEqual(create(STARTED_MATCH).status_code, 403)
+        self.assertEqual(fetch("""
+            SELECT COUNT(*) FROM fantasy_teams WHERE match_id = %s
+        """, [STARTED_MATCH]), [(0,)])
+
+    def test_get_does_not_create_a_team(self):
+        request = self.factory.get(f"/fantasy/select/{STARTED_MATCH}/")
+        request.session = {"user_id": 1}
+
+        response = json.loads(select_players_api(request, STARTED_MATCH).content)
+
+        self.assertTrue(response["locked"])
+        self.assertIsNone(response["existing_team"])
+        self.assertEqual(fetch("SELECT COUNT(*) FROM fantasy_teams"), [(0,)])
+
+
+class ScoringJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed()
+        for user_id in (1, 2, 3):
+            insert_team(STARTED_MATCH, user_id, PICKS, PICKS[user_id - 1], "BBB001")
+
+        # AAA001 scores 30, everyone else 10.
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO player_match_points (mp_id, match_id, player_id, base_points)
+                SELECT
+                    mp_id,
+                    match_id,
+                    player_id,
+                    CASE WHEN player_id = 'AAA001' THEN 30 ELSE 10 END
+                FROM match_players
+                WHERE match_id = %s
+            """, [STARTED_MATCH])
+
+    def standings(self):
+        return fetch("""
+            SELECT user_id, total_points, match_rank
+            FROM fantasy_teams
+            WHERE match_id = %s
+            ORDER BY user_id
+        """, [STARTED_MATCH])
+
+    def test_enqueue_returns_the_live_job(self):
+        job, created = enqueue_scoring_job(STARTED_MATCH)
+        again, created_again = enqueue_scoring_job(STARTED_MATCH)
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again["job_id"], job["job_id"])
+
+    def test_claim_takes_a_job_once(self):
+        job, _ = enqueue_scoring_job(STARTED_MATCH)
+
+        self.assertEqual(claim_next_job(), (job["job_id"], STARTED_MATCH, 0))
+        self.assertIsNone(claim_next_job())
+        self.assertEqual(get_job(job["job_id"])["status"], "running")
+
+    def test_stale_job_is_reclaimed_and_resumes(self):
+        enqueue_scoring_job(STARTED_MATCH)
+        job_id, match_id, _ = claim_next_job()
+
+        # The worker scored user 1, then died.
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE scoring_jobs
+                SET last_user_id = 1,
+                    updated_at = NOW() - INTERVAL '1 hour'
+                WHERE job_id = %s
+            """, [job_id])
+
+        self.assertEqual(claim_next_job(), (job_id, STARTED_MATCH, 1))
+
+        run_scoring_job(job_id, match_id, 1, chunk_size=1)
+
+        job = get_job(job_id)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["teams_total"], 3)
+        self.assertEqual(job["teams_done"], 2)
+        self.assertEqual(self.standings()[0][1], 0)
+
+    def test_run_scores_from_the_snapshot_and_is_idempotent(self):
+        # Captain x2, vice-captain x1.5: 60 + 15 + 5 x 10 for user 1,
+        # 20 + 15 + 30 + 4 x 10 for users 2 and 3.
+        expected = [(1, 125, 1), (2, 105, 2), (3, 105, 3)]
+
+        enqueue_scoring_job(STARTED_MATCH)
+        run_scoring_job(*claim_next_job(), chunk_size=2)
+        self.assertEqual(self.standings(), expected)
+
+        enqueue_scoring_job(STARTED_MATCH)
+        run_scoring_job(*claim_next_job())
+        self.assertEqual(self.standings(), expected)
+
+        self.assertEqual(fetch("""
+            SELECT user_id, total_points, rank FROM overall_leaderboard ORDER BY user_id
+        """), [(1, 125, 1), (2, 105, 2), (3, 105, 2)])
+
+    def test_failed_job_is_recorded_and_can_be_requeued(self):
+        job, _ = enqueue_scoring_job(STARTED_MATCH)
+        job_id, match_id, last_user_id = claim_next_job()
+
+        # A negative chunk size makes the scoring query itself fail.
+        with self.assertRaises(DatabaseError):
+            run_scoring_job(job_id, match_id, last_user_id, chunk_size=-1)
+
+        job = get_job(job_id)
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("LIMIT", job["error"])
+
+        retry, created = enqueue_scoring_job(STARTED_MATCH)
+        self.assertTrue(created)
+        self.assertNotEqual(retry["job_id"], job_id)
+
+    def test_endpoint_only_queues_started_matches(self):
+        def calculate(match_id):
+            request = RequestFactory().post(f"/fantasy/calculate/{match_id}/")
+            request.user = User(username="admin", is_superuser=True)
+            return calculate_match_results_api(request, match_id)
+
+        self.assertEqual(calculate(OPEN_MATCH).status_code, 409)
+        self.assertEqual(calculate(99).status_code, 404)
+        self.assertEqual(fetch("SELECT COUNT(*) FROM scoring_jobs"), [(0,)])
+
+        response = calculate(STARTED_MATCH)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(json.loads(response.content)["created"])
+
+    def test_job_for_an_open_match_fails_without_locking_it(self):
+        job, _ = enqueue_scoring_job(OPEN_MATCH)
+
+        with self.assertRaises(ValueError):
+            run_scoring_job(*claim_next_job())
+
+        self.assertEqual(get_job(job["job_id"])["status"], "failed")
+        self.assertEqual(fetch("SELECT COUNT(*) FROM match_locks"), [(0,)])
+
+
+class SquadCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed()
+
+    def setUp(self):
+        invalidate_squads()
+
+    def test_squad_is_served_from_memory(self):
+        players, by_id = get_squad(OPEN_MATCH)
+
+        self.assertEqual(len(players), 12)
+        self.assertEqual(by_id["AAA001"]["role"], "BATTER")
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_squad(OPEN_MATCH)[0], players)
+
+    def test_invalidation_reloads_the_squad(self):
+        get_squad(OPEN_MATCH)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO players (player_id, player_name, role, cost, team_id)
+                VALUES ('AAA099', 'Alpha 99', 'BOWLER', 8, 1)
+            """)
+
+        self.assertNotIn("AAA099", get_squad(OPEN_MATCH)[1])
+
+        invalidate_squads()
+
+        self.assertIn("AAA099", get_squad(OPEN_MATCH)[1])
+
+    def test_admin_player_edit_invalidates(self):
+        get_squad(OPEN_MATCH)
+
+        request = RequestFactory().post(
+            "/admin_panel/players/add/",
+            json.dumps({"player_name": "Alpha 7", "role": "BOWLER", "cost": 8, "team_id": 1}),
+            content_type="application/json",
+        )
+        request.user = User(username="admin", is_superuser=True)
+        player_id = json.loads(add_player_api(request).content)["player_id"]
+
+        self.assertEqual(player_id, "AAA007")
+        self.assertIn(player_id, get_squad(OPEN_MATCH)[1])
+
+
+class QueryPlanTests(TestCase):
+    def check_plans(self):
+        out = StringIO()
+        try:
+            call_command("check_query_plans", stdout=out)
+        finally:
+            self.output = out.getvalue()
+
+    def test_migrated_schema_has_an_index_for_every_hot_query(self):
+        self.check_plans()
+
+        self.assertNotIn("SEQ SCAN", self.output)
+        self.assertIn("ok        matchday leaderboard page", self.output)
+
+    def test_a_missing_index_fails_the_check(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT indexname FROM pg_indexes WHERE tablename = 'fantasy_team_players'
+            """)
+            for (index,) in cursor.fetchall():
+                cursor.execute(f"DROP INDEX {index}")
+
+        with self.assertRaises(CommandError):
+            self.check_plans()
+
+        self.assertIn("SEQ SCAN  team picks: fantasy_team_players", self.output)
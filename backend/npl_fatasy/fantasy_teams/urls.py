@@ -1,11 +1,15 @@
 from django.urls import path
 from .views import (
     match_list_api,
+    match_list_async_api,
     create_fantasy_team,
     select_players_api,
     fantasy_team_api,
     fantasy_team_results_api,
-    calculate_match_results_api
+    fantasy_team_results_async_api,
+    calculate_match_results_api,
+    scoring_job_status_api,
+    ownership_api
 )
 
 urlpatterns = [
@@ -13,6 +17,10 @@ urlpatterns = [
     path("create/<int:match_id>/", create_fantasy_team, name="fantasy_create"),
     path("select/<int:match_id>/", select_players_api, name="fantasy_select"),
     path("team/<int:match_id>/", fantasy_team_api, name="fantasy_team"),
+    path("ownership/<int:match_id>/", ownership_api, name="fantasy_ownership"),
     path("results/<int:match_id>/", fantasy_team_results_api, name="fantasy_results"),
+    path("async/matches/", match_list_async_api, name="fantasy_matches_async"),
+    path("async/results/<int:match_id>/", fantasy_team_results_async_api, name="fantasy_results_async"),
     path("calculate/<int:match_id>/", calculate_match_results_api, name="calculate_results"),
+    path("calculate/jobs/<int:job_id>/", scoring_job_status_api, name="scoring_job_status"),
 ]
\ No newline at end of file
@@ -1,108 +1,104 @@
 from django.http import JsonResponse
-from django.db import connection
+from django.db import connection, transaction
+from npl_fatasy.db import dictfetchall
 from users.auth import login_required
 from django.views.decorators.http import require_POST
+from django.contrib.auth.decorators import login_required as admin_login_required
 import json
-# from leaderboard.views import update_overall_leaderboard_for_user
-# from leaderboard.views import update_all_overall_ranks
-# from leaderboard.views import update_matchday_leaderboard
-
-def dictfetchall(cursor):
-    columns = [col[0] for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+from npl_fatasy import keys
+from npl_fatasy.adb import afetch_all
+from npl_fatasy.cache import cached_json
+from npl_fatasy.routing import pin_to_primary, read_connection
+from .catalog import get_squad
+from .deadline import has_started, is_editable
+from .jobs import enqueue_scoring_job, get_job
+from .ownership import apply_ownership_change, match_ownership
 
 
+def ensure_fantasy_team(cursor, fantasy_team_id, user_id, match_id):
+    """
+    Create the user's team row for a match if missing, in one round trip.
+    Returns True if a row was inserted.
+    """
+    cursor.execute("""
+        INSERT INTO fantasy_teams
+        (fantasy_team_id, user_id, match_id, total_points)
+        VALUES (%s, %s, %s, 0)
+        ON CONFLICT (fantasy_team_id) DO NOTHING
+    """, [fantasy_team_id, user_id, match_id])
+
+    return cursor.rowcount == 1
+
+
+MATCH_LIST_SQL = """
+    SELECT 
+        m.match_id,
+        m.match_date,
+        t1.team_name AS team1,
+        t2.team_name AS team2
+    FROM matches m
+    JOIN teams t1 ON m.team_1 = t1.team_id
+    JOIN teams t2 ON m.team_2 = t2.team_id
+    ORDER BY m.match_date DESC
+"""
+
+
+@cached_json("matches")
 def match_list_api(request):
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT 
-                m.match_id,
-                m.match_date,
-                t1.team_name AS team1,
-                t2.team_name AS team2
-            FROM matches m
-            JOIN teams t1 ON m.team_1 = t1.team_id
-            JOIN teams t2 ON m.team_2 = t2.team_id
-            ORDER BY m.match_date DESC
-        """)
+    with read_connection().cursor() as cursor:
+        cursor.execute(MATCH_LIST_SQL)
         matches = dictfetchall(cursor)
 
     return JsonResponse({"matches": matches})
 
 
+@cached_json("matches")
+async def match_list_async_api(request):
+    matches = await afetch_all(MATCH_LIST_SQL)
+
+    return JsonResponse({"matches": matches})
+
+
 @login_required
 def create_fantasy_team(request, match_id):
     user_id = request.session["user_id"]
-    fantasy_team_id = f"{user_id}_{match_id}"
+    fantasy_team_id = keys.fantasy_team_id(user_id, match_id)
 
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT 1 FROM fantasy_teams
-            WHERE fantasy_team_id = %s
-        """, [fantasy_team_id])
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Same deadline rule as saving picks: no new (empty) teams once the
+        # match has started.
+        if not is_editable(cursor, match_id, for_save=True):
+            return JsonResponse({"error": "Team selection is locked for this match"}, status=403)
 
-        exists = cursor.fetchone()
-
-        if not exists:
-            cursor.execute("""
-                INSERT INTO fantasy_teams
-                (fantasy_team_id, user_id, match_id, total_points)
-                VALUES (%s, %s, %s, 0)
-            """, [fantasy_team_id, user_id, match_id])
+        created = ensure_fantasy_team(cursor, fantasy_team_id, user_id, match_id)
 
-            return JsonResponse({"status": "created"})
+    if created:
+        return JsonResponse({"status": "created"})
 
     return JsonResponse({"status": "exists"})
 
 
+TEAM_PICKS_SQL = """
+    SELECT
+        player_id,
+        is_captain,
+        is_vice_captain
+    FROM fantasy_team_players
+    WHERE match_id = %s AND user_id = %s
+"""
+
+
 @login_required
 def select_players_api(request, match_id):
     user_id = request.session["user_id"]
-    fantasy_team_id = f"{user_id}_{match_id}"
-
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT 1 FROM fantasy_teams
-            WHERE fantasy_team_id = %s
-        """, [fantasy_team_id])
-
-        if not cursor.fetchone():
-            cursor.execute("""
-                INSERT INTO fantasy_teams
-                (fantasy_team_id, user_id, match_id, total_points)
-                VALUES (%s, %s, %s, 0)
-            """, [fantasy_team_id, user_id, match_id])
+    fantasy_team_id = keys.fantasy_team_id(user_id, match_id)
 
     if request.method == "GET":
+        # Read-only: the team row is created by the first save.
         with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT 
-                    p.player_id,
-                    p.player_name,
-                    p.role,
-                    p.cost,
-                    t.team_name,
-                    t.team_id
-                FROM players p
-                JOIN teams t ON p.team_id = t.team_id
-                WHERE p.team_id IN (
-                    SELECT team_1 FROM matches WHERE match_id = %s
-                    UNION
-                    SELECT team_2 FROM matches WHERE match_id = %s
-                )
-                ORDER BY t.team_name, p.player_name
-            """, [match_id, match_id])
+            locked = not is_editable(cursor, match_id)
 
-            players = dictfetchall(cursor)
-
-            cursor.execute("""
-                SELECT
-                    player_id,
-                    is_captain,
-                    is_vice_captain
-                FROM fantasy_team_players
-                WHERE fantasy_team_id = %s
-            """, [fantasy_team_id])
+            cursor.execute(TEAM_PICKS_SQL, [match_id, user_id])
 
             rows = dictfetchall(cursor)
 
@@ -114,9 +110,12 @@ def select_players_api(request, match_id):
                 "vice_captain": next((r["player_id"] for r in rows if r["is_vice_captain"]), None),
             }
 
+        players, _ = get_squad(match_id)
+
         return JsonResponse({
             "players": players,
-            "existing_team": existing_team
+            "existing_team": existing_team,
+            "locked": locked
         })
 
     if request.method == "POST":
@@ -125,7 +124,7 @@ def select_players_api(request, match_id):
         captain = data.get("captain")
         vice_captain = data.get("vice_captain")
 
-        if len(selected_players) != 7:
+        if len(selected_players) != 7 or len(set(selected_players)) != 7:
             return JsonResponse({"error": "Select exactly 7 players"}, status=400)
 
         if not captain or not vice_captain:
@@ -137,14 +136,12 @@ def select_players_api(request, match_id):
         if captain not in selected_players or vice_captain not in selected_players:
             return JsonResponse({"error": "Captain/VC must be selected players"}, status=400)
 
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT player_id, role, team_id, cost
-                FROM players
-                WHERE player_id = ANY(%s)
-            """, [selected_players])
+        _, squad = get_squad(match_id)
 
-            selected_data = dictfetchall(cursor)
+        if any(pid not in squad for pid in selected_players):
+            return JsonResponse({"error": "Players must be from this match's teams"}, status=400)
+
+        selected_data = [squad[pid] for pid in selected_players]
 
         team_count = {}
         role_count = {}
@@ -164,99 +161,150 @@ def select_players_api(request, match_id):
         if total_cost > 60:
             return JsonResponse({"error": "Budget exceeded"}, status=400)
 
-        with connection.cursor() as cursor:
+        # Deadline check, team row, all 7 players and the ownership counts
+        # in one transaction: readers never see a half-written team and the
+        # save is 5 statements regardless of size.
+        new_picks = [
+            {
+                "player_id": pid,
+                "is_captain": pid == captain,
+                "is_vice_captain": pid == vice_captain
+            }
+            for pid in selected_players
+        ]
+
+        rows = []
+        params = []
+        for p in new_picks:
+            rows.append("(%s, %s, %s, %s, %s, %s)")
+            params += [
+                fantasy_team_id, match_id, user_id,
+                p["player_id"], p["is_captain"], p["is_vice_captain"]
+            ]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Closed at match start; also holds off lock_match() until we commit.
+            if not is_editable(cursor, match_id, for_save=True):
+                return JsonResponse({"error": "Team selection is locked for this match"}, status=403)
+
+            ensure_fantasy_team(cursor, fantasy_team_id, user_id, match_id)
+
             cursor.execute("""
                 DELETE FROM fantasy_team_players
                 WHERE fantasy_team_id = %s
+                RETURNING player_id, is_captain, is_vice_captain
             """, [fantasy_team_id])
 
-            for pid in selected_players:
-                cursor.execute("""
-                    INSERT INTO fantasy_team_players
-                    (fantasy_team_id, player_id, is_captain, is_vice_captain)
-                    VALUES (%s, %s, %s, %s)
-                """, [
-                    fantasy_team_id,
-                    pid,
-                    pid == captain,
-                    pid == vice_captain
-                ])
+            old_picks = dictfetchall(cursor)
+
+            cursor.execute(f"""
+                INSERT INTO fantasy_team_players
+                (fantasy_team_id, match_id, user_id, player_id, is_captain, is_vice_captain)
+                VALUES {", ".join(rows)}
+            """, params)
+
+            apply_ownership_change(cursor, match_id, old_picks, new_picks)
+
+        # The user's next reads of their team must not hit a lagging replica.
+        pin_to_primary(request)
 
         return JsonResponse({"success": True})
 
 
-@login_required
-def fantasy_team_api(request, match_id):
-    user_id = request.session["user_id"]
-    fantasy_team_id = f"{user_id}_{match_id}"
+def ownership_api(request, match_id):
+    """
+    JSON API:
+    GET /fantasy/ownership/<match_id>/
+    Pick / captain / vice-captain percentages per player.
+    """
+    teams, players = match_ownership(match_id)
 
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT
-                p.player_name,
-                t.team_name,
-                p.role,
-                p.cost,
-                ftp.is_captain,
-                ftp.is_vice_captain
-            FROM fantasy_team_players ftp
-            JOIN players p ON ftp.player_id = p.player_id
-            JOIN teams t ON p.team_id = t.team_id
-            WHERE ftp.fantasy_team_id = %s
-            ORDER BY
-                ftp.is_captain DESC,
-                ftp.is_vice_captain DESC,
-                p.player_name
-        """, [fantasy_team_id])
+    return JsonResponse({
+        "match_id": match_id,
+        "teams": teams,
+        "players": players
+    })
+
+
+FANTASY_TEAM_SQL = """
+    SELECT
+        p.player_name,
+        t.team_name,
+        p.role,
+        p.cost,
+        ftp.is_captain,
+        ftp.is_vice_captain
+    FROM fantasy_team_players ftp
+    JOIN players p ON ftp.player_id = p.player_id
+    JOIN teams t ON p.team_id = t.team_id
+    WHERE ftp.match_id = %s AND ftp.user_id = %s
+    ORDER BY
+        ftp.is_captain DESC,
+        ftp.is_vice_captain DESC,
+        p.player_name
+"""
 
-        players = dictfetchall(cursor)
-    update_overall_leaderboard_for_user(user_id)
-    update_all_overall_ranks()
-    update_matchday_leaderboard(match_id)
-    return JsonResponse({"players": players})
 
 @login_required
-def fantasy_team_results_api(request, match_id):
+def fantasy_team_api(request, match_id):
     user_id = request.session["user_id"]
-    fantasy_team_id = f"{user_id}_{match_id}"
 
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT
-                p.player_name,
-                t.team_name,
-                p.role,
-                ftp.is_captain,
-                ftp.is_vice_captain,
-                ft.total_points,
-                (
-                    (COALESCE(ps.runs,0) / 10.0) +
-                    (COALESCE(ps.run_rate,0) / 100.0) +
-                    (CASE 
-                        WHEN COALESCE(ps.econ,0) > 0 
-                        THEN 10.0 / ps.econ 
-                        ELSE 0 
-                    END) +
-                    (COALESCE(ps.wickets,0) * 2) +
-                    (COALESCE(ps.sixes,0)) +
-                    (COALESCE(ps.fours,0) * 0.5) +
-                    (COALESCE(ps.catches,0))
-                ) AS base_points
-            FROM fantasy_team_players ftp
-            JOIN fantasy_teams ft 
-                ON ft.fantasy_team_id = ftp.fantasy_team_id
-            JOIN players p ON ftp.player_id = p.player_id
-            JOIN teams t ON p.team_id = t.team_id
-            JOIN match_players mp 
-                ON mp.player_id = p.player_id 
-               AND mp.match_id = %s
-            LEFT JOIN player_stats ps ON ps.mp_id = mp.mp_id
-            WHERE ftp.fantasy_team_id = %s
-            ORDER BY ftp.is_captain DESC, ftp.is_vice_captain DESC
-        """, [match_id, fantasy_team_id])
+    with read_connection().cursor() as cursor:
+        cursor.execute(FANTASY_TEAM_SQL, [match_id, user_id])
 
         players = dictfetchall(cursor)
 
+    return JsonResponse({"players": players})
+
+# Results of a locked match come from its frozen snapshot.
+RESULTS_SQL = """
+    SELECT
+        p.player_name,
+        t.team_name,
+        p.role,
+        s.multiplier = 2 AS is_captain,
+        s.multiplier = 1.5 AS is_vice_captain,
+        ft.total_points,
+        COALESCE(pmp.base_points, 0) AS base_points
+    FROM fantasy_team_snapshots s
+    JOIN fantasy_teams ft
+        ON ft.user_id = s.user_id
+       AND ft.match_id = s.match_id
+    JOIN players p ON s.player_id = p.player_id
+    JOIN teams t ON p.team_id = t.team_id
+    LEFT JOIN player_match_points pmp
+        ON pmp.match_id = s.match_id
+       AND pmp.player_id = s.player_id
+    WHERE s.match_id = %s AND s.user_id = %s
+    ORDER BY s.multiplier DESC
+"""
+
+# Before the match is locked: the live picks.
+LIVE_RESULTS_SQL = """
+    SELECT
+        p.player_name,
+        t.team_name,
+        p.role,
+        ftp.is_captain,
+        ftp.is_vice_captain,
+        ft.total_points,
+        COALESCE(pmp.base_points, 0) AS base_points
+    FROM fantasy_team_players ftp
+    JOIN fantasy_teams ft 
+        ON ft.user_id = ftp.user_id
+       AND ft.match_id = ftp.match_id
+    JOIN players p ON ftp.player_id = p.player_id
+    JOIN teams t ON p.team_id = t.team_id
+    JOIN match_players mp 
+        ON mp.player_id = p.player_id 
+       AND mp.match_id = %s
+    LEFT JOIN player_match_points pmp ON pmp.mp_id = mp.mp_id
+    WHERE ftp.match_id = %s AND ftp.user_id = %s
+    ORDER BY ftp.is_captain DESC, ftp.is_vice_captain DESC
+"""
+
+
+def results_response(players):
     for p in players:
         if p["is_captain"]:
             p["final_points"] = round(p["base_points"] * 2, 2)
@@ -273,84 +321,67 @@ def fantasy_team_results_api(request, match_id):
     })
 
 
-# @require_POST
-def calculate_match_results_api(request, match_id):
-    """
-    Calculate & store fantasy points for ALL users for a match
-    """
+@login_required
+def fantasy_team_results_api(request, match_id):
+    user_id = request.session["user_id"]
 
-    with connection.cursor() as cursor:
-        # Get all fantasy teams for this match
-        cursor.execute("""
-            SELECT fantasy_team_id, user_id
-            FROM fantasy_teams
-            WHERE match_id = %s
-        """, [match_id])
+    with read_connection().cursor() as cursor:
+        cursor.execute(RESULTS_SQL, [match_id, user_id])
+        players = dictfetchall(cursor)
 
-        teams = dictfetchall(cursor)
+        if not players:
+            cursor.execute(LIVE_RESULTS_SQL, [match_id, match_id, user_id])
+            players = dictfetchall(cursor)
 
-    for team in teams:
-        fantasy_team_id = team["fantasy_team_id"]
-        user_id = team["user_id"]
+    return results_response(players)
 
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT
-                    ftp.is_captain,
-                    ftp.is_vice_captain,
-                    (
-                        (COALESCE(ps.runs,0) / 10.0) +
-                        (COALESCE(ps.run_rate,0) / 100.0) +
-                        (CASE 
-                            WHEN COALESCE(ps.econ,0) > 0 
-                            THEN 10.0 / ps.econ 
-                            ELSE 0 
-                        END) +
-                        (COALESCE(ps.wickets,0) * 2) +
-                        (COALESCE(ps.sixes,0)) +
-                        (COALESCE(ps.fours,0) * 0.5) +
-                        (COALESCE(ps.catches,0))
-                    ) AS base_points
-                FROM fantasy_team_players ftp
-                JOIN match_players mp 
-                    ON mp.player_id = ftp.player_id
-                   AND mp.match_id = %s
-                LEFT JOIN player_stats ps 
-                    ON ps.mp_id = mp.mp_id
-                WHERE ftp.fantasy_team_id = %s
-            """, [match_id, fantasy_team_id])
 
-            players = dictfetchall(cursor)
+@login_required
+async def fantasy_team_results_async_api(request, match_id):
+    user_id = await request.session.aget("user_id")
 
-        total_points = 0
+    players = await afetch_all(RESULTS_SQL, [match_id, user_id])
 
-        for p in players:
-            if p["is_captain"]:
-                total_points += p["base_points"] * 2
-            elif p["is_vice_captain"]:
-                total_points += p["base_points"] * 1.5
-            else:
-                total_points += p["base_points"]
+    if not players:
+        players = await afetch_all(LIVE_RESULTS_SQL, [match_id, match_id, user_id])
 
-        total_points = round(total_points, 2)
+    return results_response(players)
 
-        # 🔥 Store result
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                UPDATE fantasy_teams
-                SET total_points = %s
-                WHERE fantasy_team_id = %s
-            """, [total_points, fantasy_team_id])
 
-        # 🔥 Update leaderboards
-        update_overall_leaderboard_for_user(user_id)
+@require_POST
+@admin_login_required
+def calculate_match_results_api(request, match_id):
+    """
+    Queue scoring of ALL fantasy teams for a match (admins only).
+    Poll calculate/jobs/<job_id>/ for progress.
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({"error": "Admin only"}, status=403)
+
+    with connection.cursor() as cursor:
+        started = has_started(cursor, match_id)
+
+    if started is None:
+        return JsonResponse({"error": "Match not found"}, status=404)
 
-    update_all_overall_ranks()
-    update_matchday_leaderboard(match_id)
+    # Scoring freezes every team of the match, so not before it starts.
+    if not started:
+        return JsonResponse({"error": "Match has not started yet"}, status=409)
+
+    job, created = enqueue_scoring_job(match_id)
 
     return JsonResponse({
-        "status": "success",
+        "status": job["status"],
         "match_id": match_id,
-        "teams_processed": len(teams)
-    })
+        "job_id": job["job_id"],
+        "created": created
+    }, status=202)
+
+
+def scoring_job_status_api(request, job_id):
+    job = get_job(job_id)
+
+    if not job:
+        return JsonResponse({"error": "Job not found"}, status=404)
 
+    return JsonResponse(job)
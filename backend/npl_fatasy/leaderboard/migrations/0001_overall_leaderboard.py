@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS overall_leaderboard (
+                    user_id INTEGER PRIMARY KEY REFERENCES users (user_id) ON DELETE CASCADE,
+                    total_points NUMERIC(12, 2) NOT NULL DEFAULT 0,
+                    rank INTEGER,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                CREATE INDEX IF NOT EXISTS overall_leaderboard_rank_idx
+                    ON overall_leaderboard (rank, user_id);
+            """,
+            reverse_sql="DROP TABLE IF EXISTS overall_leaderboard;",
+        ),
+        # Backfill: each user's total over their fantasy teams, then ranks.
+        # Inlined rather than calling leaderboard.standings, so the migration
+        # keeps doing what it did when it was written.
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO overall_leaderboard (user_id, total_points, updated_at)
+                SELECT user_id, COALESCE(SUM(total_points), 0), NOW()
+                FROM fantasy_teams
+                GROUP BY user_id
+                ON CONFLICT (user_id) DO UPDATE
+                SET total_points = EXCLUDED.total_points,
+                    updated_at = EXCLUDED.updated_at;
+
+                UPDATE overall_leaderboard ol
+                SET rank = ranked.rank
+                FROM (
+                    SELECT
+                        user_id,
+                        DENSE_RANK() OVER (ORDER BY total_points DESC) AS rank
+                    FROM overall_leaderboard
+                ) ranked
+                WHERE ol.user_id = ranked.user_id
+                  AND ol.rank IS DISTINCT FROM ranked.rank;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
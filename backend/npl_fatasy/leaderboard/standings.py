@@ -0,0 +1,101 @@
+from django.db import connection
+
+
+def update_overall_leaderboard_for_match(match_id):
+    """
+    Recompute cumulative points for every user who has a team in match_id.
+
+    Returns the number of leaderboard rows written.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT user_id FROM fantasy_teams WHERE match_id = %s
+        """, [match_id])
+
+        user_ids = [row[0] for row in cursor.fetchall()]
+
+    return update_overall_leaderboard_for_users(user_ids)
+
+
+def update_overall_leaderboard_for_users(user_ids):
+    """
+    Recompute the cumulative points of the given users from fantasy_teams.
+
+    The users' rows are locked first, in a statement of their own, so the
+    SUM runs after any concurrent writer for them has committed and sees
+    its team totals. Returns the number of leaderboard rows written.
+    """
+    if not user_ids:
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT 1
+            FROM overall_leaderboard
+            WHERE user_id = ANY(%s)
+            ORDER BY user_id
+            FOR UPDATE
+        """, [list(user_ids)])
+
+        cursor.execute("""
+            INSERT INTO overall_leaderboard (user_id, total_points, updated_at)
+            SELECT
+                ft.user_id,
+                COALESCE(SUM(ft.total_points), 0),
+                NOW()
+            FROM fantasy_teams ft
+            WHERE ft.user_id = ANY(%s)
+            GROUP BY ft.user_id
+            ON CONFLICT (user_id) DO UPDATE
+            SET total_points = EXCLUDED.total_points,
+                updated_at = EXCLUDED.updated_at
+        """, [list(user_ids)])
+
+        return cursor.rowcount
+
+
+def update_all_overall_ranks():
+    """
+    Re-snapshot the dense rank of every user, touching only rows whose rank moved.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE overall_leaderboard ol
+            SET rank = ranked.rank
+            FROM (
+                SELECT
+                    user_id,
+                    DENSE_RANK() OVER (ORDER BY total_points DESC) AS rank
+                FROM overall_leaderboard
+            ) ranked
+            WHERE ol.user_id = ranked.user_id
+              AND ol.rank IS DISTINCT FROM ranked.rank
+        """)
+
+        return cursor.rowcount
+
+
+def update_match_ranks(match_id):
+    """
+    Re-snapshot every team's position on the match's board, touching only
+    rows whose position moved.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE fantasy_teams ft
+            SET match_rank = ranked.match_rank
+            FROM (
+                SELECT
+                    user_id,
+                    ROW_NUMBER() OVER (
+                        ORDER BY total_points DESC, user_id
+                    ) AS match_rank
+                FROM fantasy_teams
+                WHERE match_id = %s
+            ) ranked
+            WHERE ft.match_id = %s
+              AND ft.user_id = ranked.user_id
+              AND ft.match_rank IS DISTINCT FROM ranked.match_rank
+        """, [match_id, match_id])
+
+        return cursor.rowcount
@@ -1,3 +1,212 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.db import connection
+from django.test import RequestFactory, TestCase
+
+from .standings import (
+    update_all_overall_ranks,
+    update_match_ranks,
+    update_overall_leaderboard_for_match,
+)
+from .views import (
+    matchday_leaderboard_api,
+    matchday_leaderboard_around_me_api,
+    overall_leaderboard_api,
+    overall_leaderboard_around_me_api,
+)
+
+
+MATCH = 1
+
+# user_id -> points; three-way ties at 50 and 40.
+POINTS = {1: 30, 2: 50, 3: 40, 4: 50, 5: 40, 6: 40, 7: 20, 8: 50}
+
+# (points DESC, user_id)
+MATCHDAY_ORDER = [2, 4, 8, 3, 5, 6, 1, 7]
+
+# Dense rank: 50 -> 1, 40 -> 2, 30 -> 3, 20 -> 4.
+OVERALL_RANKS = {2: 1, 4: 1, 8: 1, 3: 2, 5: 2, 6: 2, 1: 3, 7: 4}
+
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO teams (team_id, team_name, acronym)
+                VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB');
+
+                INSERT INTO matches (match_id, match_date, team_1, team_2)
+                VALUES (%s, CURRENT_DATE - 1, 1, 2);
+            """, [MATCH])
+
+            for user_id, points in POINTS.items():
+                cursor.execute("""
+                    INSERT INTO users (user_id, username, password)
+                    VALUES (%s, %s, 'x');
+
+                    INSERT INTO fantasy_teams (fantasy_team_id, user_id, match_id, total_points)
+                    VALUES (%s || '_' || %s, %s, %s, %s);
+                """, [user_id, f"user{user_id}", user_id, MATCH, user_id, MATCH, points])
+
+        update_match_ranks(MATCH)
+        update_overall_leaderboard_for_match(MATCH)
+        update_all_overall_ranks()
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get(self, view, params=None, user_id=None, **kwargs):
+        request = self.factory.get("/", params or {})
+        request.session = {} if user_id is None else {"user_id": user_id}
+        response = view(request, **kwargs)
+        return response.status_code, json.loads(response.content)
+
+    def walk(self, view, limit, **kwargs):
+        """Follow next_cursor from the first page to the end."""
+        rows = []
+        params = {"limit": limit}
+        while True:
+            status, page = self.get(view, params, **kwargs)
+            self.assertEqual(status, 200)
+            rows += page["leaderboard"]
+            if page["next_cursor"] is None:
+                return rows
+            params = {"limit": limit, **page["next_cursor"]}
+
+    def test_matchday_pages_cross_tie_groups(self):
+        for limit in (1, 2, 3, 5):
+            with self.subTest(limit=limit):
+                rows = self.walk(matchday_leaderboard_api, limit, match_id=MATCH)
+
+                self.assertEqual([r["user_id"] for r in rows], MATCHDAY_ORDER)
+                self.assertEqual([r["rank"] for r in rows], list(range(1, 9)))
+
+    def test_matchday_keyset_page_matches_offset_page(self):
+        _, first = self.get(matchday_leaderboard_api, {"limit": 4}, match_id=MATCH)
+        _, by_offset = self.get(matchday_leaderboard_api, {"limit": 4, "offset": 4}, match_id=MATCH)
+        _, by_cursor = self.get(
+            matchday_leaderboard_api, {"limit": 4, **first["next_cursor"]}, match_id=MATCH
+        )
+
+        self.assertEqual(first["next_cursor"], {"after_points": "40.00", "after_user_id": 3})
+        self.assertEqual(by_cursor["leaderboard"], by_offset["leaderboard"])
+
+    def test_matchday_ranks_ignore_the_client(self):
+        _, page = self.get(
+            matchday_leaderboard_api,
+            {"limit": 2, "after_points": "40.00", "after_user_id": 3, "after_rank": 1000},
+            match_id=MATCH,
+        )
+
+        self.assertEqual([(r["user_id"], r["rank"]) for r in page["leaderboard"]], [(5, 5), (6, 6)])
+
+    def test_overall_pages_cross_tie_groups(self):
+        for limit in (1, 2, 3, 5):
+            with self.subTest(limit=limit):
+                rows = self.walk(overall_leaderboard_api, limit)
+
+                self.assertEqual([r["user_id"] for r in rows], MATCHDAY_ORDER)
+                self.assertEqual(
+                    [r["rank"] for r in rows],
+                    [OVERALL_RANKS[user_id] for user_id in MATCHDAY_ORDER],
+                )
+
+    def test_bad_cursor_is_rejected(self):
+        for after_points in ("abc", "NaN", "Infinity"):
+            with self.subTest(after_points=after_points):
+                status, _ = self.get(
+                    matchday_leaderboard_api,
+                    {"after_points": after_points, "after_user_id": 1},
+                    match_id=MATCH,
+                )
+                self.assertEqual(status, 400)
+
+        status, _ = self.get(overall_leaderboard_api, {"after_rank": "x"})
+        self.assertEqual(status, 400)
+
+    def test_matchday_around_me(self):
+        status, body = self.get(
+            matchday_leaderboard_around_me_api, {"n": 2}, user_id=5, match_id=MATCH
+        )
+
+        self.assertEqual(status, 200)
+        self.assertEqual((body["me"]["user_id"], body["me"]["rank"]), (5, 5))
+        self.assertEqual([(r["user_id"], r["rank"]) for r in body["above"]], [(8, 3), (3, 4)])
+        self.assertEqual([(r["user_id"], r["rank"]) for r in body["below"]], [(6, 6), (1, 7)])
+
+    def test_overall_around_me(self):
+        status, body = self.get(overall_leaderboard_around_me_api, {"n": 2}, user_id=5)
+
+        self.assertEqual(status, 200)
+        self.assertEqual((body["me"]["user_id"], body["me"]["rank"]), (5, 2))
+        self.assertEqual([(r["user_id"], r["rank"]) for r in body["above"]], [(8, 1), (3, 2)])
+        self.assertEqual([(r["user_id"], r["rank"]) for r in body["below"]], [(6, 2), (1, 3)])
+
+    def test_around_me_at_the_edges(self):
+        _, top = self.get(matchday_leaderboard_around_me_api, {"n": 2}, user_id=2, match_id=MATCH)
+        _, bottom = self.get(overall_leaderboard_around_me_api, {"n": 2}, user_id=7)
+
+        self.assertEqual(top["above"], [])
+        self.assertEqual([r["user_id"] for r in top["below"]], [4, 8])
+        self.assertEqual([r["user_id"] for r in bottom["above"]], [6, 1])
+        self.assertEqual(bottom["below"], [])
+
+
+class OverallStandingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Users 1-3 play match 1, users 2-4 match 2.
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO teams (team_id, team_name, acronym)
+                VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB');
+
+                INSERT INTO matches (match_id, match_date, team_1, team_2)
+                VALUES (1, CURRENT_DATE - 2, 1, 2), (2, CURRENT_DATE - 1, 2, 1);
+
+                INSERT INTO users (user_id, username, password)
+                SELECT i, 'user' || i, 'x' FROM generate_series(1, 4) i;
+
+                INSERT INTO fantasy_teams (fantasy_team_id, user_id, match_id, total_points)
+                VALUES
+                    ('1_1', 1, 1, 30), ('2_1', 2, 1, 20), ('3_1', 3, 1, 10),
+                    ('2_2', 2, 2, 10), ('3_2', 3, 2, 20), ('4_2', 4, 2, 5);
+            """)
+
+    def standings(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT user_id, total_points, rank FROM overall_leaderboard ORDER BY user_id
+            """)
+            return cursor.fetchall()
+
+    def test_totals_span_every_match_of_the_users(self):
+        self.assertEqual(update_overall_leaderboard_for_match(1), 3)
+
+        self.assertEqual(
+            [(user_id, total) for user_id, total, _ in self.standings()],
+            [(1, 30), (2, 30), (3, 30)],
+        )
+
+        self.assertEqual(update_overall_leaderboard_for_match(2), 3)
+
+        self.assertEqual(
+            [(user_id, total) for user_id, total, _ in self.standings()],
+            [(1, 30), (2, 30), (3, 30), (4, 5)],
+        )
+
+    def test_ranks_are_dense_and_only_moved_rows_are_touched(self):
+        update_overall_leaderboard_for_match(1)
+        update_overall_leaderboard_for_match(2)
+
+        self.assertEqual(update_all_overall_ranks(), 4)
+        self.assertEqual(self.standings(), [(1, 30, 1), (2, 30, 1), (3, 30, 1), (4, 5, 2)])
+        self.assertEqual(update_all_overall_ranks(), 0)
+
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE fantasy_teams SET total_points = 40 WHERE fantasy_team_id = '4_2'")
+        update_overall_leaderboard_for_match(2)
+
+        self.assertEqual(update_all_overall_ranks(), 4)
+        self.assertEqual(self.standings(), [(1, 30, 2), (2, 30, 2), (3, 30, 2), (4, 40, 1)])
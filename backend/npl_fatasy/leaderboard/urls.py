@@ -4,5 +4,9 @@ from . import views
 app_name='leaderboard'
 urlpatterns=[
     path('api/overall/',views.overall_leaderboard_api,name='overall_leaderboard'),
-    path('api/match/<int:match_id>/',views.matchday_leaderboard_api,name='matchday_leaderboard')
+    path('api/overall/me/',views.overall_leaderboard_around_me_api,name='overall_leaderboard_around_me'),
+    path('api/match/<int:match_id>/',views.matchday_leaderboard_api,name='matchday_leaderboard'),
+    path('api/match/<int:match_id>/me/',views.matchday_leaderboard_around_me_api,name='matchday_leaderboard_around_me'),
+    path('api/async/overall/',views.overall_leaderboard_async_api,name='overall_leaderboard_async'),
+    path('api/async/match/<int:match_id>/',views.matchday_leaderboard_async_api,name='matchday_leaderboard_async')
 ]
\ No newline at end of file
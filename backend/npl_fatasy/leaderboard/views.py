@@ -4,63 +4,371 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from datetime import datetime
-from django.db import connection
+from decimal import Decimal, InvalidOperation
+from npl_fatasy.adb import afetch_all
+from npl_fatasy.db import dictfetchall
+from npl_fatasy.routing import read_connection
+from users.auth import login_required
 
 
-def dictfetchall(cursor):
-    columns = [col[0] for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+# Leaderboards are paged by keyset: the client sends back the last row it
+# saw (next_cursor) and we seek past it through the index instead of
+# sorting and discarding OFFSET rows.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 100
 
-@require_http_methods(["GET"])
-def overall_leaderboard_api(request):
-    limit = int(request.GET.get("limit", 100))
+
+def page_size(request):
+    limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+OVERALL_FIRST_PAGE_SQL = """
+    SELECT
+        ol.rank,
+        u.user_id AS user_id,
+        u.username,
+        ol.total_points
+    FROM overall_leaderboard ol
+    JOIN users u ON ol.user_id = u.user_id
+    ORDER BY ol.rank, ol.user_id
+    LIMIT %s OFFSET %s
+"""
+
+OVERALL_AFTER_SQL = """
+    SELECT
+        ol.rank,
+        u.user_id AS user_id,
+        u.username,
+        ol.total_points
+    FROM overall_leaderboard ol
+    JOIN users u ON ol.user_id = u.user_id
+    WHERE (ol.rank, ol.user_id) > (%s, %s)
+    ORDER BY ol.rank, ol.user_id
+    LIMIT %s
+"""
+
+# Ranks come from fantasy_teams.match_rank, maintained by scoring (null
+# until the match is scored), so every page shows the same positions
+# whichever way it was reached.
+MATCHDAY_FIRST_PAGE_SQL = """
+    SELECT
+        ft.match_rank AS rank,
+        u.user_id AS user_id,
+        u.username,
+        ft.total_points
+    FROM fantasy_teams ft
+    JOIN users u ON ft.user_id = u.user_id
+    WHERE ft.match_id = %s
+    ORDER BY ft.total_points DESC, ft.user_id
+    LIMIT %s OFFSET %s
+"""
+
+# A range seek on fantasy_teams_match_points_idx (match_id, total_points DESC,
+# user_id): the scan starts at total_points <= cursor and only the cursor's
+# tie group is filtered on user_id.
+MATCHDAY_AFTER_SQL = """
+    SELECT
+        ft.match_rank AS rank,
+        u.user_id AS user_id,
+        u.username,
+        ft.total_points
+    FROM fantasy_teams ft
+    JOIN users u ON ft.user_id = u.user_id
+    WHERE ft.match_id = %s
+      AND ft.total_points <= %s
+      AND (ft.total_points < %s OR ft.user_id > %s)
+    ORDER BY ft.total_points DESC, ft.user_id
+    LIMIT %s
+"""
+
+
+def parse_points(value):
+    """
+    Parse a points cursor as Decimal, not float: total_points is NUMERIC and
+    a float8 comparison cannot use the index. Raises ValueError.
+    """
+    try:
+        points = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid points: {value!r}")
+
+    if not points.is_finite():
+        raise ValueError(f"Invalid points: {value!r}")
+
+    return points
+
+
+def overall_page_query(request):
+    """
+    (sql, params, limit, offset) for an overall leaderboard page.
+    Raises ValueError on bad pagination parameters.
+    """
+    limit = page_size(request)
     offset = int(request.GET.get("offset", 0))
+    after_rank = request.GET.get("after_rank")
+    after_user_id = int(request.GET.get("after_user_id", 0))
 
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT
-                ROW_NUMBER() OVER (ORDER BY SUM(ft.total_points) DESC) AS rank,
-                u.user_id AS user_id,
-                u.username,
-                SUM(ft.total_points) AS total_points
-            FROM fantasy_teams ft
-            JOIN users u ON ft.user_id = u.user_id
-            GROUP BY u.user_id, u.username
-            ORDER BY total_points DESC
-            LIMIT %s OFFSET %s
-        """, [limit, offset])
+    if after_rank is not None:
+        return OVERALL_AFTER_SQL, [int(after_rank), after_user_id, limit], limit, offset
 
-        leaderboard = dictfetchall(cursor)
+    return OVERALL_FIRST_PAGE_SQL, [limit, offset], limit, offset
+
+
+def overall_page_response(leaderboard, limit, offset):
+    next_cursor = None
+    if len(leaderboard) == limit:
+        last = leaderboard[-1]
+        next_cursor = {
+            "after_rank": last["rank"],
+            "after_user_id": last["user_id"]
+        }
+
+    return JsonResponse({
+        "leaderboard": leaderboard,
+        "limit": limit,
+        "offset": offset,
+        "next_cursor": next_cursor
+    })
+
+
+def matchday_page_query(request, match_id):
+    """
+    (sql, params, limit) for a matchday leaderboard page.
+    Raises ValueError on bad pagination parameters.
+    """
+    limit = page_size(request)
+    offset = int(request.GET.get("offset", 0))
+    after_points = request.GET.get("after_points")
+    after_user_id = int(request.GET.get("after_user_id", 0))
+
+    if after_points is not None:
+        after_points = parse_points(after_points)
+        return MATCHDAY_AFTER_SQL, [
+            match_id, after_points, after_points, after_user_id, limit
+        ], limit
+
+    return MATCHDAY_FIRST_PAGE_SQL, [match_id, limit, offset], limit
+
+
+def matchday_page_response(match_id, leaderboard, limit):
+    next_cursor = None
+    if len(leaderboard) == limit:
+        last = leaderboard[-1]
+        next_cursor = {
+            "after_points": last["total_points"],
+            "after_user_id": last["user_id"]
+        }
 
     return JsonResponse({
+        "match_id": match_id,
         "leaderboard": leaderboard,
         "limit": limit,
-        "offset": offset
+        "next_cursor": next_cursor
     })
 
 
+@require_http_methods(["GET"])
+def overall_leaderboard_api(request):
+    """
+    GET /leaderboard/api/overall/?limit=&after_rank=&after_user_id=
+    """
+    try:
+        sql, params, limit, offset = overall_page_query(request)
+    except ValueError:
+        return JsonResponse({"error": "Invalid pagination parameters"}, status=400)
+
+    with read_connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        leaderboard = dictfetchall(cursor)
+
+    return overall_page_response(leaderboard, limit, offset)
+
+
+@require_http_methods(["GET"])
+async def overall_leaderboard_async_api(request):
+    """
+    GET /leaderboard/api/async/overall/ — same as overall_leaderboard_api, for ASGI.
+    """
+    try:
+        sql, params, limit, offset = overall_page_query(request)
+    except ValueError:
+        return JsonResponse({"error": "Invalid pagination parameters"}, status=400)
+
+    leaderboard = await afetch_all(sql, params)
+
+    return overall_page_response(leaderboard, limit, offset)
+
+
 @require_http_methods(["GET"])
 def matchday_leaderboard_api(request, match_id):
-    limit = int(request.GET.get("limit", 100))
-    offset = int(request.GET.get("offset", 0))
+    """
+    GET /leaderboard/api/match/<match_id>/?limit=&after_points=&after_user_id=
+    """
+    try:
+        sql, params, limit = matchday_page_query(request, match_id)
+    except ValueError:
+        return JsonResponse({"error": "Invalid pagination parameters"}, status=400)
 
-    with connection.cursor() as cursor:
+    with read_connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        leaderboard = dictfetchall(cursor)
+
+    return matchday_page_response(match_id, leaderboard, limit)
+
+
+@require_http_methods(["GET"])
+async def matchday_leaderboard_async_api(request, match_id):
+    """
+    GET /leaderboard/api/async/match/<match_id>/ — same as matchday_leaderboard_api, for ASGI.
+    """
+    try:
+        sql, params, limit = matchday_page_query(request, match_id)
+    except ValueError:
+        return JsonResponse({"error": "Invalid pagination parameters"}, status=400)
+
+    leaderboard = await afetch_all(sql, params)
+
+    return matchday_page_response(match_id, leaderboard, limit)
+
+
+AROUND_DEFAULT = 5
+AROUND_MAX = 25
+
+
+def around_size(request):
+    n = int(request.GET.get("n", AROUND_DEFAULT))
+    return max(0, min(n, AROUND_MAX))
+
+
+@require_http_methods(["GET"])
+@login_required
+def overall_leaderboard_around_me_api(request):
+    """
+    GET /leaderboard/api/overall/me/?n=
+    The logged-in user's overall rank plus n entries either side.
+    """
+    user_id = request.session["user_id"]
+
+    try:
+        n = around_size(request)
+    except ValueError:
+        return JsonResponse({"error": "Invalid n"}, status=400)
+
+    with read_connection().cursor() as cursor:
         cursor.execute("""
-            SELECT
-                ROW_NUMBER() OVER (ORDER BY ft.total_points DESC) AS rank,
-                u.user_id AS user_id,
-                u.username,
-                ft.total_points
+            SELECT ol.rank, u.user_id AS user_id, u.username, ol.total_points
+            FROM overall_leaderboard ol
+            JOIN users u ON ol.user_id = u.user_id
+            WHERE ol.user_id = %s
+        """, [user_id])
+
+        me = dictfetchall(cursor)
+
+        if not me:
+            return JsonResponse({"error": "Not on the leaderboard yet"}, status=404)
+
+        me = me[0]
+
+        # Both neighbours are seeks on overall_leaderboard_rank_idx (rank, user_id)
+        cursor.execute("""
+            SELECT ol.rank, u.user_id AS user_id, u.username, ol.total_points
+            FROM overall_leaderboard ol
+            JOIN users u ON ol.user_id = u.user_id
+            WHERE (ol.rank, ol.user_id) < (%s, %s)
+            ORDER BY ol.rank DESC, ol.user_id DESC
+            LIMIT %s
+        """, [me["rank"], user_id, n])
+
+        above = dictfetchall(cursor)[::-1]
+
+        cursor.execute("""
+            SELECT ol.rank, u.user_id AS user_id, u.username, ol.total_points
+            FROM overall_leaderboard ol
+            JOIN users u ON ol.user_id = u.user_id
+            WHERE (ol.rank, ol.user_id) > (%s, %s)
+            ORDER BY ol.rank, ol.user_id
+            LIMIT %s
+        """, [me["rank"], user_id, n])
+
+        below = dictfetchall(cursor)
+
+    return JsonResponse({
+        "me": me,
+        "above": above,
+        "below": below
+    })
+
+
+# The n teams just ahead of / behind (total_points, user_id) on a matchday
+# board. Both are range seeks on fantasy_teams_match_points_idx bounded by
+# the user's own points.
+MATCHDAY_ABOVE_SQL = """
+    SELECT ft.match_rank AS rank, u.user_id AS user_id, u.username, ft.total_points
+    FROM fantasy_teams ft
+    JOIN users u ON ft.user_id = u.user_id
+    WHERE ft.match_id = %s
+      AND ft.total_points >= %s
+      AND (ft.total_points > %s OR ft.user_id < %s)
+    ORDER BY ft.total_points ASC, ft.user_id DESC
+    LIMIT %s
+"""
+
+MATCHDAY_BELOW_SQL = """
+    SELECT ft.match_rank AS rank, u.user_id AS user_id, u.username, ft.total_points
+    FROM fantasy_teams ft
+    JOIN users u ON ft.user_id = u.user_id
+    WHERE ft.match_id = %s
+      AND ft.total_points <= %s
+      AND (ft.total_points < %s OR ft.user_id > %s)
+    ORDER BY ft.total_points DESC, ft.user_id
+    LIMIT %s
+"""
+
+
+@require_http_methods(["GET"])
+@login_required
+def matchday_leaderboard_around_me_api(request, match_id):
+    """
+    GET /leaderboard/api/match/<match_id>/me/?n=
+    The logged-in user's rank in a match plus n entries either side.
+    """
+    user_id = request.session["user_id"]
+
+    try:
+        n = around_size(request)
+    except ValueError:
+        return JsonResponse({"error": "Invalid n"}, status=400)
+
+    with read_connection().cursor() as cursor:
+        cursor.execute("""
+            SELECT ft.match_rank AS rank, u.user_id AS user_id, u.username, ft.total_points
             FROM fantasy_teams ft
             JOIN users u ON ft.user_id = u.user_id
-            WHERE ft.match_id = %s
-            ORDER BY ft.total_points DESC
-            LIMIT %s OFFSET %s
-        """, [match_id, limit, offset])
+            WHERE ft.match_id = %s AND ft.user_id = %s
+        """, [match_id, user_id])
 
-        leaderboard = dictfetchall(cursor)
+        me = dictfetchall(cursor)
+
+        if not me:
+            return JsonResponse({"error": "No team for this match"}, status=404)
+
+        me = me[0]
+        points = me["total_points"]
+
+        # match_rank is maintained by scoring (null until the match is
+        # scored), so no counting here.
+        cursor.execute(MATCHDAY_ABOVE_SQL, [match_id, points, points, user_id, n])
+
+        above = dictfetchall(cursor)[::-1]
+
+        cursor.execute(MATCHDAY_BELOW_SQL, [match_id, points, points, user_id, n])
+
+        below = dictfetchall(cursor)
 
     return JsonResponse({
         "match_id": match_id,
-        "leaderboard": leaderboard
-    })
\ No newline at end of file
+        "me": me,
+        "above": above,
+        "below": below
+    })
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS match_players_match_player_key
+                    ON match_players (match_id, player_id);
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS match_players_match_player_key;",
+        ),
+    ]
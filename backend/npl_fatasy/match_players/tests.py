@@ -1,3 +1,81 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from .views import manage_match_players
+
+
+MATCH = 1
+
+
+def fetch(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+class PlayingXITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO teams (team_id, team_name, acronym)
+                VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB');
+
+                INSERT INTO players (player_id, player_name, role, cost, team_id)
+                VALUES
+                    ('AAA001', 'Alpha 1', 'BATTER', 8, 1),
+                    ('AAA002', 'Alpha 2', 'BOWLER', 8, 1),
+                    ('BBB001', 'Bravo 1', 'BATTER', 8, 2),
+                    ('BBB002', 'Bravo 2', 'BOWLER', 8, 2);
+
+                INSERT INTO matches (match_id, match_date, team_1, team_2)
+                VALUES (%s, CURRENT_DATE, 1, 2);
+
+                INSERT INTO users (user_id, username, password)
+                VALUES (1, 'admin', 'x');
+            """, [MATCH])
+
+    def save(self, playing):
+        request = RequestFactory().post(f"/match-players/{MATCH}/", {"playing": playing})
+        request.session = {"user_id": 1}
+        return manage_match_players(request, MATCH)
+
+    def rows(self):
+        # ctid moves whenever a row is rewritten.
+        return {
+            mp_id: (is_playing, ctid)
+            for mp_id, is_playing, ctid in fetch("""
+                SELECT mp_id, is_playing, ctid::text
+                FROM match_players
+                WHERE match_id = %s
+            """, [MATCH])
+        }
+
+    def test_first_save_creates_the_squad(self):
+        self.assertEqual(self.save(["AAA001", "BBB001"]).status_code, 302)
+
+        self.assertEqual(
+            {mp_id: is_playing for mp_id, (is_playing, _) in self.rows().items()},
+            {"1_AAA001": True, "1_AAA002": False, "1_BBB001": True, "1_BBB002": False},
+        )
+
+    def test_resave_only_rewrites_changed_rows(self):
+        self.save(["AAA001", "BBB001"])
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO player_stats (stat_id, mp_id, runs)
+                VALUES ('1_AAA001_STAT', '1_AAA001', 40)
+            """)
+        before = self.rows()
+
+        self.save(["AAA001", "BBB002"])
+
+        after = self.rows()
+        self.assertEqual(after["1_AAA001"], before["1_AAA001"])
+        self.assertEqual(after["1_AAA002"], before["1_AAA002"])
+        self.assertEqual(after["1_BBB001"][0], False)
+        self.assertEqual(after["1_BBB002"][0], True)
+        self.assertNotEqual(after["1_BBB001"][1], before["1_BBB001"][1])
+
+        # Stats keep pointing at the same match player.
+        self.assertEqual(fetch("SELECT mp_id, runs FROM player_stats"), [("1_AAA001", 40)])
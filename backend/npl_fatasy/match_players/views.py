@@ -1,14 +1,11 @@
 # Create your views here.
 from django.shortcuts import render, redirect
-from django.db import connection
+from django.db import connection, transaction
+from npl_fatasy import keys
+from npl_fatasy.db import dictfetchall
 import uuid
 from users.auth import login_required
 
-def dictfetchall(cursor):
-    columns = [col[0] for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-
 def manage_match_players(request, match_id):
     # 1. Fetch match & teams
     with connection.cursor() as cursor:
@@ -53,32 +50,44 @@ def manage_match_players(request, match_id):
 
         players = dictfetchall(cursor)
 
-    # 3. Save selections
+    # 3. Save selections: upsert every squad row in one statement, only
+    # flipping is_playing where it changed. Rows (and their mp_id, which
+    # player_stats references) are never deleted and re-created.
     if request.method == "POST":
-        selected_players = request.POST.getlist("playing")
+        selected_players = set(request.POST.getlist("playing"))
 
-        with connection.cursor() as cursor:
-            # Remove old records for this match
-            cursor.execute(
-                "DELETE FROM match_players WHERE match_id = %s",
-                [match_id]
-            )
+        values = []
+        params = []
+        for player in players:
+            player_id = player["player_id"]
 
-            # Insert fresh records
-            for player in players:
-                player_id = player["player_id"]
-                is_playing = player_id in selected_players
+            # ✅ PRIMARY KEY FORMAT: matchid_playerid
+            mp_id = keys.mp_id(match_id, player_id)
 
-                # ✅ PRIMARY KEY FORMAT: matchid_playerid
-                mp_id = f"{match_id}_{player_id}"
+            values.append("(%s, %s, %s, %s)")
+            params += [mp_id, match_id, player_id, player_id in selected_players]
 
-                cursor.execute("""
+        with transaction.atomic(), connection.cursor() as cursor:
+            if values:
+                cursor.execute(f"""
                     INSERT INTO match_players
                     (mp_id, match_id, player_id, is_playing)
-                    VALUES (%s, %s, %s, %s)
-                """, [mp_id, match_id, player_id, is_playing])
+                    VALUES {", ".join(values)}
+                    ON CONFLICT (mp_id) DO UPDATE
+                    SET is_playing = EXCLUDED.is_playing
+                    WHERE match_players.is_playing IS DISTINCT FROM EXCLUDED.is_playing
+                """, params)
+
+            # Players no longer in either squad can't be playing
+            cursor.execute("""
+                UPDATE match_players
+                SET is_playing = FALSE
+                WHERE match_id = %s
+                  AND is_playing
+                  AND player_id <> ALL(%s)
+            """, [match_id, [p["player_id"] for p in players]])
 
-        return redirect("match_list")
+        return redirect("manage_match_players", match_id=match_id)
 
     return render(request, "manage_match_players.html", {
         "match": {
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        # match_id was allocated as MAX + 1, which races between admins.
+        # Inserts now take nextval() from this sequence in the same statement.
+        migrations.RunSQL(
+            sql="""
+                CREATE SEQUENCE IF NOT EXISTS matches_match_id_alloc_seq
+                    OWNED BY matches.match_id;
+
+                SELECT setval(
+                    'matches_match_id_alloc_seq',
+                    GREATEST(
+                        (SELECT COALESCE(MAX(match_id), 0) + 1 FROM matches),
+                        (SELECT last_value FROM matches_match_id_alloc_seq)
+                    ),
+                    false
+                );
+            """,
+            reverse_sql="DROP SEQUENCE IF EXISTS matches_match_id_alloc_seq;",
+        ),
+    ]
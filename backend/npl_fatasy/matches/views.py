@@ -1,14 +1,13 @@
 from django.http import JsonResponse
-from django.db import connection
+from npl_fatasy.db import namedtuplefetchall
+from npl_fatasy.routing import read_connection
 from django.utils.timezone import localdate
-
-def dictfetchall(cursor):
-    columns = [col[0] for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+from npl_fatasy.cache import cached_json
 
 
+@cached_json("matches")
 def match_list_api(request):
-    with connection.cursor() as cursor:
+    with read_connection().cursor() as cursor:
         cursor.execute("""
             SELECT 
                 m.match_id,
@@ -20,17 +19,17 @@ def match_list_api(request):
             JOIN teams t2 ON m.team_2 = t2.team_id
             ORDER BY m.match_date ASC
         """)
-        rows = dictfetchall(cursor)
+        rows = namedtuplefetchall(cursor)
 
     today = localdate()
     matches = []
 
     for row in rows:
         matches.append({
-            "id": row["match_id"],
-            "teams": f"{row['team1_name']} vs {row['team2_name']}",
-            "time": row["match_date"].strftime("%b %d"),
-            "status": "Upcoming" if row["match_date"] >= today else "Completed"
+            "id": row.match_id,
+            "teams": f"{row.team1_name} vs {row.team2_name}",
+            "time": row.match_date.strftime("%b %d"),
+            "status": "Upcoming" if row.match_date >= today else "Completed"
         })
 
     return JsonResponse(matches, safe=False)
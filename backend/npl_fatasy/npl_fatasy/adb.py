@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from npl_fatasy.routing import read_alias
+
+
+# Async raw-SQL helpers for the async (ASGI) views.
+#
+# Django's connection.cursor() blocks, so under ASGI every sync view holds
+# a thread while it waits on Postgres. These helpers talk to Postgres
+# through psycopg's async driver instead, with one AsyncConnectionPool per
+# alias per event loop sized by the same DB_POOL_* settings, so one worker
+# can have many slow queries in flight.
+DB_POOL_MIN_SIZE = getattr(settings, "DB_POOL_MIN_SIZE", 2)
+DB_POOL_MAX_SIZE = getattr(settings, "DB_POOL_MAX_SIZE", 10)
+DB_POOL_TIMEOUT = getattr(settings, "DB_POOL_TIMEOUT", 10)
+DB_POOL_MAX_IDLE = getattr(settings, "DB_POOL_MAX_IDLE", 300)
+DB_POOL_MAX_LIFETIME = getattr(settings, "DB_POOL_MAX_LIFETIME", 1800)
+
+# OPTIONS keys Django consumes itself; the rest are libpq parameters.
+DJANGO_OPTIONS = {"pool", "isolation_level", "assume_role", "server_side_binding"}
+
+_pools = {}
+_query_hooks = []
+
+
+def _connect_kwargs(alias):
+    db = connections.settings[alias]
+    kwargs = {
+        "dbname": db.get("NAME"),
+        "user": db.get("USER"),
+        "password": db.get("PASSWORD"),
+        "host": db.get("HOST"),
+        "port": db.get("PORT"),
+    }
+    kwargs.update({
+        k: v for k, v in db.get("OPTIONS", {}).items()
+        if k not in DJANGO_OPTIONS
+    })
+    return {k: v for k, v in kwargs.items() if v not in (None, "")}
+
+
+def _configure(alias):
+    """
+    The per-connection setup Django's init_connection_state() does for its
+    own connections (time zone, assume_role), so the async views see the
+    same timestamps and permissions as the sync ones.
+    """
+    from psycopg import sql
+
+    timezone_name = connections[alias].timezone_name
+    role = connections.settings[alias].get("OPTIONS", {}).get("assume_role")
+
+    async def configure(conn):
+        if timezone_name and conn.info.parameter_status("TimeZone") != timezone_name:
+            await conn.execute("SELECT set_config('TimeZone', %s, false)", [timezone_name])
+        if role:
+            await conn.execute(sql.SQL("SET ROLE {}").format(sql.Identifier(role)))
+
+    return configure
+
+
+async def _open_pool(alias):
+    from psycopg import AsyncClientCursor
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+
+    pool = AsyncConnectionPool(
+        kwargs={
+            **_connect_kwargs(alias),
+            "autocommit": True,
+            # Client-side binding, like Django's default, so the shared SQL
+            # strings behave the same on both paths.
+            "cursor_factory": AsyncClientCursor,
+            "row_factory": dict_row,
+        },
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        max_idle=DB_POOL_MAX_IDLE,
+        max_lifetime=DB_POOL_MAX_LIFETIME,
+        check=AsyncConnectionPool.check_connection,
+        configure=_configure(alias),
+        name=f"{alias}-async",
+        open=False,
+    )
+    await pool.open()
+    return pool
+
+
+async def get_pool(alias):
+    # Pools belong to the loop that opened them. Concurrent first callers
+    # share one opening task instead of each opening a pool.
+    key = (alias, id(asyncio.get_running_loop()))
+    future = _pools.get(key)
+    if future is None:
+        future = _pools[key] = asyncio.ensure_future(_open_pool(alias))
+
+    try:
+        return await future
+    except Exception:
+        # Don't cache the failure (database down, bad credentials): the
+        # next caller tries to open the pool again.
+        if _pools.get(key) is future:
+            del _pools[key]
+        raise
+
+
+async def close_pools():
+    """
+    Close this event loop's pools, e.g. before the loop itself is closed.
+    """
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _pools if key[1] == loop_id]:
+        pool = await _pools.pop(key)
+        await pool.close()
+
+
+def add_query_hook(hook):
+    """
+    Register hook(sql, duration_s) to run after every async helper query.
+    """
+    _query_hooks.append(hook)
+
+
+def remove_query_hook(hook):
+    _query_hooks.remove(hook)
+
+
+async def afetch_all(sql, params=None, using=None):
+    """
+    Run a read-only query and return its rows as dicts. Without `using`,
+    the alias is chosen by npl_fatasy.routing (replica or primary).
+    """
+    alias = using or read_alias()
+    started = time.perf_counter()
+    pool = await get_pool(alias)
+
+    async with pool.connection() as conn:
+        cursor = await conn.execute(sql, params)
+        rows = await cursor.fetchall()
+
+    duration = time.perf_counter() - started
+    for hook in _query_hooks:
+        hook(sql, duration)
+
+    return rows
+
@@ -0,0 +1,137 @@
+import hashlib
+import time
+from contextlib import nullcontext
+from inspect import iscoroutinefunction
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+from npl_fatasy.routing import primary_reads, recently
+
+
+# Cached responses for public, read-only JSON endpoints.
+#
+# Entries are grouped into namespaces ("teams", "matches", "players").
+# Each namespace has a version stamp stored in the cache itself, and
+# invalidate_responses() just replaces the stamp, so every worker sharing
+# the cache backend sees the invalidation and stale entries age out. The
+# stamp is the invalidation time: entries rebuilt within
+# REPLICA_STICKY_SECONDS of it are read from the primary, not a replica
+# that may not have the write yet.
+RESPONSE_CACHE_TTL = getattr(settings, "RESPONSE_CACHE_TTL", 300)
+
+
+def _seed_version():
+    # A missing stamp (cold or evicted cache) is not an invalidation. The
+    # negated time is still unique, so entries keyed on an older stamp are
+    # never picked up again, but recently() is false for it.
+    return -time.time_ns()
+
+
+def _namespace_version(namespace):
+    return cache.get_or_set(f"ns:{namespace}", _seed_version, None)
+
+
+async def _anamespace_version(namespace):
+    return await cache.aget_or_set(f"ns:{namespace}", _seed_version, None)
+
+
+def invalidate_responses(*namespaces):
+    for namespace in namespaces:
+        cache.set(f"ns:{namespace}", time.time_ns(), None)
+
+
+def _key(request, namespace, version, params):
+    """
+    The path plus only the query params the view reads, sorted, so extra or
+    reordered params (?utm_source=..., cache busters) share one entry.
+    """
+    query = urlencode(sorted((p, request.GET[p]) for p in params if p in request.GET))
+    return f"resp:{namespace}:{version}:{request.path}?{query}"
+
+
+def _rebuild_reads(version):
+    # Just after an invalidation a replica may not have the write yet.
+    return primary_reads() if recently(version) else nullcontext()
+
+
+def _entry(response):
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    return (etag, response.content, response["Content-Type"])
+
+
+def _cached_response(request, entry):
+    etag, content, content_type = entry
+
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+
+    if etag in if_none_match or "*" in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def cached_json(namespace, timeout=None, params=()):
+    """
+    Cache a GET view's JSON body and answer If-None-Match with 304.
+    Only 200 responses are cached. Works on sync and async views.
+    params names the query parameters the view reads; others are ignored.
+    """
+    if timeout is None:
+        timeout = RESPONSE_CACHE_TTL
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != "GET":
+                    return await view_func(request, *args, **kwargs)
+
+                version = await _anamespace_version(namespace)
+                key = _key(request, namespace, version, params)
+                entry = await cache.aget(key)
+
+                if entry is None:
+                    with _rebuild_reads(version):
+                        response = await view_func(request, *args, **kwargs)
+                    if response.status_code != 200 or response.streaming:
+                        return response
+
+                    entry = _entry(response)
+                    await cache.aset(key, entry, timeout)
+
+                return _cached_response(request, entry)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view_func(request, *args, **kwargs)
+
+            version = _namespace_version(namespace)
+            key = _key(request, namespace, version, params)
+            entry = cache.get(key)
+
+            if entry is None:
+                with _rebuild_reads(version):
+                    response = view_func(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+
+                entry = _entry(response)
+                cache.set(key, entry, timeout)
+
+            return _cached_response(request, entry)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,65 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+
+
+# Shared raw-SQL helpers.
+#
+# dictfetchall()/namedtuplefetchall() turn a cursor's result into rows.
+# stream() iterates a large result in fetch_size batches through a
+# server-side cursor, so only one batch is held in memory at a time.
+# Query timing is done by npl_fatasy.middleware with execute_wrapper,
+# which sees these queries like any other.
+DB_FETCH_SIZE = getattr(settings, "DB_FETCH_SIZE", 2000)
+
+
+def dictfetchall(cursor):
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def namedtuplefetchall(cursor):
+    Row = namedtuple("Row", [col[0] for col in cursor.description], rename=True)
+    return [Row(*row) for row in cursor.fetchall()]
+
+
+def _row_factory(cursor, row_type):
+    columns = [col[0] for col in cursor.description]
+
+    if row_type == "dict":
+        return lambda row: dict(zip(columns, row))
+    if row_type == "namedtuple":
+        Row = namedtuple("Row", columns, rename=True)
+        return lambda row: Row(*row)
+    if row_type == "tuple":
+        return tuple
+    raise ValueError(f"Unknown row_type: {row_type}")
+
+
+def _streaming_cursor():
+    # Named (server-side) cursors need Postgres and break behind
+    # transaction-mode poolers, which set DISABLE_SERVER_SIDE_CURSORS.
+    if connection.vendor == "postgresql" and not connection.settings_dict.get(
+        "DISABLE_SERVER_SIDE_CURSORS"
+    ):
+        return connection.chunked_cursor()
+    return connection.cursor()
+
+
+def stream(sql, params=None, fetch_size=None, row_type="dict"):
+    """
+    Yield rows one at a time, fetching fetch_size rows per round trip.
+    """
+    fetch_size = fetch_size or DB_FETCH_SIZE
+
+    with _streaming_cursor() as cursor:
+        cursor.execute(sql, params)
+        make_row = _row_factory(cursor, row_type)
+
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield make_row(row)
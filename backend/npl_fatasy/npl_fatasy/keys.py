@@ -0,0 +1,32 @@
+# Legacy text keys and their structured equivalents.
+#
+# fantasy_team_id, mp_id and stat_id are still the text primary keys, but
+# joins and range scans go through the integer columns next to them:
+# fantasy_team_players(match_id, user_id) and match_players(match_id,
+# player_id). Build the text keys only through these helpers so the formats
+# live in one place until the text keys can be dropped. The *_sql variants
+# build the same keys inside set-based INSERTs from SQL expressions.
+
+
+def fantasy_team_id(user_id, match_id):
+    return f"{user_id}_{match_id}"
+
+
+def fantasy_team_id_sql(user_id, match_id):
+    return f"({user_id}) || '_' || ({match_id})"
+
+
+def mp_id(match_id, player_id):
+    return f"{match_id}_{player_id}"
+
+
+def mp_id_sql(match_id, player_id):
+    return f"({match_id}) || '_' || ({player_id})"
+
+
+def stat_id(mp_id):
+    return f"{mp_id}_STAT"
+
+
+def stat_id_sql(mp_id):
+    return f"({mp_id}) || '_STAT'"
@@ -0,0 +1,217 @@
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from npl_fatasy import adb
+from npl_fatasy.pooling import pool_stats
+
+
+logger = logging.getLogger("npl_fatasy.querytiming")
+
+# Per-request SQL instrumentation.
+#
+# A sampled request gets an execute_wrapper on every DB connection that
+# counts statements and DB time and keeps the slowest few. The totals go
+# out as a Server-Timing header and into a per-endpoint histogram of DB
+# time, which is logged and reset every QUERY_TIMING_DUMP_EVERY samples
+# together with the connection pools' wait counters (npl_fatasy.pooling).
+# Admins can read the current window at /admin_panel/query-timing/.
+SAMPLE_RATE = getattr(settings, "QUERY_TIMING_SAMPLE_RATE", 1.0)
+DUMP_EVERY = getattr(settings, "QUERY_TIMING_DUMP_EVERY", 500)
+SLOWEST_KEPT = 3
+
+# Upper bounds (ms) of the DB-time histogram buckets; the last one is open.
+BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+_lock = threading.Lock()
+_histogram = {}
+_samples = 0
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add(sql, time.perf_counter() - started)
+
+    def add(self, sql, duration):
+        self.count += 1
+        self.total += duration
+        self.slowest.append((duration, sql))
+        self.slowest.sort(key=lambda item: item[0], reverse=True)
+        del self.slowest[SLOWEST_KEPT:]
+
+
+# Async views query through npl_fatasy.adb, not Django connections; their
+# queries reach the sampled request's stats through this context variable.
+_async_stats = ContextVar("npl_query_stats", default=None)
+
+
+def _add_async_query(sql, duration):
+    stats = _async_stats.get()
+    if stats is not None:
+        stats.add(sql, duration)
+
+
+adb.add_query_hook(_add_async_query)
+
+
+def _record(endpoint, stats):
+    global _samples
+
+    db_ms = stats.total * 1000
+    bucket = next((i for i, bound in enumerate(BUCKETS_MS) if db_ms <= bound), len(BUCKETS_MS))
+
+    with _lock:
+        entry = _histogram.setdefault(endpoint, {
+            "requests": 0,
+            "queries": 0,
+            "max_queries": 0,
+            "db_ms": 0.0,
+            "buckets": [0] * (len(BUCKETS_MS) + 1),
+        })
+        entry["requests"] += 1
+        entry["queries"] += stats.count
+        entry["max_queries"] = max(entry["max_queries"], stats.count)
+        entry["db_ms"] += db_ms
+        entry["buckets"][bucket] += 1
+
+        _samples += 1
+        if _samples < DUMP_EVERY:
+            return
+        snapshot = dict(_histogram)
+        _histogram.clear()
+        _samples = 0
+
+    dump_histogram(snapshot)
+
+
+def histogram_snapshot():
+    with _lock:
+        return json.loads(json.dumps(_histogram))
+
+
+def histogram_report(snapshot=None, reset_pools=False):
+    """
+    This process's histogram since the last dump, with the pool counters.
+    """
+    if snapshot is None:
+        snapshot = histogram_snapshot()
+    return {
+        "bucket_bounds_ms": BUCKETS_MS,
+        "endpoints": snapshot,
+        "pools": pool_stats(reset=reset_pools),
+    }
+
+
+def dump_histogram(snapshot=None):
+    logger.info(json.dumps(histogram_report(snapshot, reset_pools=True)))
+
+
+def wrap_connections(stack, stats):
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(stats))
+
+
+def _sampled():
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+class QueryTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not _sampled():
+            return self.get_response(request)
+
+        stats = QueryStats()
+        with ExitStack() as stack:
+            wrap_connections(stack, stats)
+            response = self.get_response(request)
+
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+
+        stats = QueryStats()
+        token = _async_stats.set(stats)
+
+        # Sync views under ASGI run in the request's thread-sensitive
+        # executor thread, which has its own Django connections: wrap those
+        # there, as __call__ does.
+        stack = ExitStack()
+        await sync_to_async(wrap_connections)(stack, stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _async_stats.reset(token)
+
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        match = request.resolver_match
+        endpoint = match.view_name if match else request.path
+
+        # Server-Timing goes out with the headers, so for a streamed body it
+        # only covers the queries run before the first chunk.
+        timing = [f'db;dur={stats.total * 1000:.1f};desc="{stats.count} queries"']
+        for i, (duration, sql) in enumerate(stats.slowest, start=1):
+            timing.append(f"sql{i};dur={duration * 1000:.1f}")
+        response["Server-Timing"] = ", ".join(timing)
+
+        if response.streaming and not response.is_async:
+            # Rows are fetched while the server consumes the body, after the
+            # middleware has returned: keep counting until the stream ends.
+            response.streaming_content = self.count_stream(
+                response.streaming_content, endpoint, stats
+            )
+        else:
+            self.record(endpoint, stats)
+
+        return response
+
+    def count_stream(self, chunks, endpoint, stats):
+        # Runs in the thread consuming the body (the request thread under
+        # WSGI, the request's thread-sensitive executor under ASGI).
+        try:
+            with ExitStack() as stack:
+                wrap_connections(stack, stats)
+                yield from chunks
+        finally:
+            self.record(endpoint, stats)
+
+    def record(self, endpoint, stats):
+        _record(endpoint, stats)
+
+        if stats.slowest:
+            logger.debug("%s slowest queries: %s", endpoint, [
+                (round(duration * 1000, 1), " ".join(sql.split())[:200])
+                for duration, sql in stats.slowest
+            ])
@@ -0,0 +1,37 @@
+from django.db import connections
+
+
+# Pooled Postgres connections (Django 5.1+ with psycopg 3 and psycopg_pool).
+#
+# settings.py puts an OPTIONS["pool"] dict on every Postgres alias when
+# DB_POOL is on. Django then keeps one psycopg_pool.ConnectionPool per alias
+# per process instead of one persistent connection per thread. Because those
+# aliases also set CONN_HEALTH_CHECKS, Django builds the pool with
+# check=ConnectionPool.check_connection, so each connection is checked before
+# it is handed out. The pool's counters (connections opened, requests served,
+# time spent waiting for a free connection) are read here.
+
+
+def pooled_aliases():
+    return [
+        alias for alias in connections
+        if connections.settings[alias].get("OPTIONS", {}).get("pool")
+    ]
+
+
+def pool_stats(reset=False):
+    """
+    {alias: psycopg_pool stats} for every pooled alias.
+
+    With reset, the counters are returned and zeroed (pop_stats), so
+    periodic logs show each window's waits rather than running totals.
+    """
+    stats = {}
+
+    for alias in pooled_aliases():
+        pool = connections[alias].pool
+        if pool is None:
+            continue
+        stats[alias] = pool.pop_stats() if reset else pool.get_stats()
+
+    return stats
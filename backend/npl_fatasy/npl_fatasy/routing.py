@@ -0,0 +1,139 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+
+# Read/write splitting.
+#
+# "default" is the primary; every other DATABASES alias starting with
+# "replica" is a read replica. Raw-SQL read-only views take their cursor
+# from read_connection(), which picks a replica unless the request is
+# pinned to the primary. A request is pinned when it is not a GET/HEAD,
+# when it is inside a transaction, or when it arrives within
+# REPLICA_STICKY_SECONDS of a write by the same browser (pin_to_primary()
+# sets a short-lived cookie), so users read their own writes back despite
+# replication lag. Shared caches refilled right after an invalidation read
+# through primary_reads(), so a lagging replica can't put the old data back.
+REPLICA_STICKY_SECONDS = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+STICKY_COOKIE = "npl_primary"
+
+REPLICAS = [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+# Django's own tables (sessions, auth, admin) always read from the primary:
+# a lagging login or session row would log users out.
+PRIMARY_ONLY_APPS = {"admin", "auth", "contenttypes", "sessions"}
+
+_pinned = ContextVar("npl_pinned_to_primary", default=False)
+
+
+def read_alias():
+    if not REPLICAS or _pinned.get() or connections["default"].in_atomic_block:
+        return "default"
+    return random.choice(REPLICAS)
+
+
+def read_connection():
+    return connections[read_alias()]
+
+
+def pin_to_primary(request):
+    """
+    Send the rest of this request, and the same browser's requests for the
+    next REPLICA_STICKY_SECONDS, to the primary. Call after a write.
+    """
+    _pinned.set(True)
+    request.pin_to_primary = True
+
+
+def recently(invalidated_at_ns):
+    """
+    True while a write at invalidated_at_ns (time.time_ns()) may not have
+    reached the replicas yet.
+    """
+    return time.time_ns() - invalidated_at_ns < REPLICA_STICKY_SECONDS * 1_000_000_000
+
+
+@contextmanager
+def primary_reads():
+    """
+    Send read_connection() / read_alias() to the primary inside the block.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    ORM side of the same policy: writes and migrations go to the primary,
+    reads follow read_alias().
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return "default"
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaPinningMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = _pinned.set(self.pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = _pinned.set(self.pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+        return self.finish(request, response)
+
+    def pinned(self, request):
+        return (
+            request.method not in ("GET", "HEAD")
+            or STICKY_COOKIE in request.COOKIES
+        )
+
+    def finish(self, request, response):
+        if getattr(request, "pin_to_primary", False):
+            response.set_cookie(
+                STICKY_COOKIE, "1",
+                max_age=REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+
+        return response
@@ -0,0 +1,58 @@
+# The project's base tables. They predate the Django migrations, which only
+# add indexes, columns and derived tables on top of them, so a database
+# built from scratch (the match-day bench's schema, the test database)
+# creates these first and then applies the migrations' SQL.
+BASE_SCHEMA_SQL = """
+    CREATE TABLE users (
+        user_id SERIAL PRIMARY KEY,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL
+    );
+    CREATE TABLE teams (
+        team_id INTEGER PRIMARY KEY,
+        team_name TEXT NOT NULL,
+        acronym TEXT NOT NULL
+    );
+    CREATE TABLE players (
+        player_id TEXT PRIMARY KEY,
+        player_name TEXT NOT NULL,
+        role TEXT NOT NULL,
+        cost NUMERIC NOT NULL,
+        team_id INTEGER REFERENCES teams (team_id)
+    );
+    CREATE TABLE matches (
+        match_id INTEGER PRIMARY KEY,
+        match_date DATE NOT NULL,
+        team_1 INTEGER REFERENCES teams (team_id),
+        team_2 INTEGER REFERENCES teams (team_id)
+    );
+    CREATE TABLE match_players (
+        mp_id TEXT PRIMARY KEY,
+        match_id INTEGER REFERENCES matches (match_id),
+        player_id TEXT REFERENCES players (player_id),
+        is_playing BOOLEAN NOT NULL DEFAULT FALSE
+    );
+    CREATE TABLE player_stats (
+        stat_id TEXT PRIMARY KEY,
+        mp_id TEXT REFERENCES match_players (mp_id),
+        run_rate DOUBLE PRECISION,
+        econ DOUBLE PRECISION,
+        wickets INTEGER,
+        sixes INTEGER,
+        fours INTEGER,
+        catches INTEGER,
+        runs INTEGER
+    );
+    CREATE TABLE fantasy_teams (
+        fantasy_team_id TEXT PRIMARY KEY,
+        user_id INTEGER REFERENCES users (user_id),
+        match_id INTEGER REFERENCES matches (match_id),
+        total_points NUMERIC(12, 2) NOT NULL DEFAULT 0
+    );
+    CREATE TABLE fantasy_team_players (
+        fantasy_team_id TEXT REFERENCES fantasy_teams (fantasy_team_id),
+        player_id TEXT REFERENCES players (player_id),
+        is_captain BOOLEAN NOT NULL DEFAULT FALSE,
+        is_vice_captain BOOLEAN NOT NULL DEFAULT FALSE
+    );
+"""
@@ -53,6 +53,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    'npl_fatasy.middleware.QueryTimingMiddleware',
+    'npl_fatasy.routing.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -121,11 +123,106 @@ from dotenv import load_dotenv
 import os
 load_dotenv()
 
+DATABASE_SSL_REQUIRE = os.getenv('DATABASE_SSL_REQUIRE', 'true').lower() == 'true'
+
 DATABASES = { 'default': dj_database_url.parse(os.getenv('DATABASE_URL'), 
                 conn_max_age=600,
-                ssl_require=True) 
+                ssl_require=DATABASE_SSL_REQUIRE) 
             }
 
+# Read replicas (npl_fatasy.routing): DATABASE_REPLICA_URLS is a comma-separated
+# list, registered as replica_1, replica_2, ... Read-only views spread over
+# them; a browser that just wrote reads from the primary for
+# REPLICA_STICKY_SECONDS.
+for i, url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    DATABASES[f'replica_{i}'] = dj_database_url.parse(url.strip(),
+                conn_max_age=600,
+                ssl_require=DATABASE_SSL_REQUIRE)
+    DATABASES[f'replica_{i}']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['npl_fatasy.routing.PrimaryReplicaRouter']
+
+# The test database needs the base tables before migrate (npl_fatasy.schema)
+TEST_RUNNER = 'npl_fatasy.test_runner.NplTestRunner'
+
+REPLICA_STICKY_SECONDS = 5
+
+# Connection pooling (npl_fatasy.pooling): every Postgres alias gets a
+# psycopg_pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE connections per process.
+# Requests wait up to DB_POOL_TIMEOUT seconds for a free connection; idle
+# connections close after DB_POOL_MAX_IDLE and all are recycled after
+# DB_POOL_MAX_LIFETIME. Pools replace persistent connections, so CONN_MAX_AGE
+# is 0 on pooled aliases. DB_POOL=false falls back to persistent connections.
+# CONN_HEALTH_CHECKS is on either way: with a pool it makes Django pass
+# check=ConnectionPool.check_connection, so a connection killed while idle in
+# the pool is replaced before a request gets it.
+DB_POOL = os.getenv('DB_POOL', 'true').lower() == 'true'
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '300'))
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+
+for alias, db in DATABASES.items():
+    if DB_POOL and db['ENGINE'] == 'django.db.backends.postgresql':
+        db['CONN_MAX_AGE'] = 0
+        db.setdefault('OPTIONS', {})['pool'] = {
+            'name': alias,
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_idle': DB_POOL_MAX_IDLE,
+            'max_lifetime': DB_POOL_MAX_LIFETIME,
+        }
+    db['CONN_HEALTH_CHECKS'] = True
+
+
+# Cache
+# Local memory per process by default. Point CACHE_BACKEND/CACHE_LOCATION at
+# a shared backend (e.g. django.core.cache.backends.redis.RedisCache) so
+# response-cache invalidations reach every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'npl-fantasy'),
+    }
+}
+
+# Seconds a cached public JSON response lives (npl_fatasy.cache)
+RESPONSE_CACHE_TTL = 300
+
+# Fraction of requests whose SQL is counted and timed (npl_fatasy.middleware),
+# and how many sampled requests go into each logged per-endpoint histogram.
+QUERY_TIMING_SAMPLE_RATE = float(os.getenv('QUERY_TIMING_SAMPLE_RATE', '1.0' if DEBUG else '0.05'))
+QUERY_TIMING_DUMP_EVERY = 500
+
+# The histogram dumps are INFO records on npl_fatasy.querytiming; Django's
+# default logging would drop them. QUERY_TIMING_LOG_LEVEL=DEBUG adds each
+# sampled request's slowest statements.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'npl_fatasy.querytiming': {
+            'handlers': ['console'],
+            'level': os.getenv('QUERY_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Background scoring (fantasy_teams.jobs): teams per transaction, and how long
+# a running job may go silent before another worker takes it over.
+SCORING_CHUNK_SIZE = 5000
+SCORING_JOB_STALE_SECONDS = 300
+
+# Rows fetched per round trip when streaming a server-side cursor (npl_fatasy.db)
+DB_FETCH_SIZE = 2000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -162,3 +259,6 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+# Seconds a match squad stays in the in-process cache (fantasy_teams.catalog)
+SQUAD_CACHE_TTL = 300
@@ -0,0 +1,54 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+# Streaming JSON for large list endpoints.
+#
+# A view opts in per request: ?stream=json (or ?stream=1) streams the usual
+# {"<key>": [...]} body; ?stream=ndjson or "Accept: application/x-ndjson"
+# streams one JSON object per line. Rows are serialized as they come off
+# npl_fatasy.db.stream(), so memory stays flat regardless of table size
+# under WSGI. Under ASGI, Django consumes a sync iterator into a list before
+# sending it, so the whole body is buffered there.
+NDJSON = "application/x-ndjson"
+
+_encoder = DjangoJSONEncoder()
+
+
+def stream_format(request):
+    """
+    Return "json", "ndjson" or None (regular JsonResponse).
+    """
+    requested = request.GET.get("stream", "").lower()
+
+    if requested == "ndjson" or NDJSON in request.headers.get("Accept", ""):
+        return "ndjson"
+    if requested in ("1", "true", "json"):
+        return "json"
+    return None
+
+
+def _json_body(rows, key):
+    yield f'{{"{key}": ['
+
+    first = True
+    for row in rows:
+        yield ("" if first else ", ") + _encoder.encode(row)
+        first = False
+
+    yield "]}"
+
+
+def _ndjson_body(rows):
+    for row in rows:
+        yield _encoder.encode(row) + "\n"
+
+
+def streaming_json_response(rows, key, fmt):
+    """
+    Stream an iterable of rows as {key: [...]} or as NDJSON.
+    """
+    if fmt == "ndjson":
+        return StreamingHttpResponse(_ndjson_body(rows), content_type=NDJSON)
+
+    return StreamingHttpResponse(_json_body(rows, key), content_type="application/json")
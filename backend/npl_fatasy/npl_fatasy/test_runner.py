@@ -0,0 +1,26 @@
+from django.db import connections
+from django.db.models.signals import pre_migrate
+from django.test.runner import DiscoverRunner
+
+from npl_fatasy.schema import BASE_SCHEMA_SQL
+
+
+# The project's migrations are RunSQL on top of tables they don't create
+# (npl_fatasy.schema). The test database is built from scratch, so the base
+# tables go in just before migrate runs.
+
+
+def create_base_schema(using, **kwargs):
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT to_regclass('users')")
+        if cursor.fetchone()[0] is None:
+            cursor.execute(BASE_SCHEMA_SQL)
+
+
+class NplTestRunner(DiscoverRunner):
+    def setup_databases(self, **kwargs):
+        pre_migrate.connect(create_base_schema, dispatch_uid="npl_base_schema")
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            pre_migrate.disconnect(dispatch_uid="npl_base_schema")
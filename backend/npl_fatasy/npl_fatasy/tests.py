@@ -0,0 +1,429 @@
+import asyncio
+import json
+from io import StringIO
+from unittest import mock
+
+import psycopg
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+
+from leaderboard.standings import (
+    update_all_overall_ranks,
+    update_match_ranks,
+    update_overall_leaderboard_for_match,
+)
+from . import keys, middleware, routing
+from .adb import afetch_all, close_pools
+from .cache import _namespace_version, _rebuild_reads, invalidate_responses
+from .db import dictfetchall, namedtuplefetchall, stream
+from .pooling import pool_stats, pooled_aliases
+from .routing import recently
+
+
+class CachedJsonTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO teams (team_id, team_name, acronym)
+                VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB')
+            """)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_revalidation_answers_304(self):
+        first = self.client.get("/teams/list/")
+        etag = first["ETag"]
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["Cache-Control"], "no-cache")
+
+        with self.assertNumQueries(0):
+            again = self.client.get("/teams/list/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        self.assertEqual(again["ETag"], etag)
+
+        other = self.client.get("/teams/list/", HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(other.status_code, 200)
+        self.assertEqual(other.content, first.content)
+
+    def test_entries_are_served_until_invalidated(self):
+        etag = self.client.get("/teams/list/")["ETag"]
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO teams (team_id, team_name, acronym) VALUES (3, 'Charlie', 'CCC')")
+
+        self.assertEqual(len(self.client.get("/teams/list/").json()), 2)
+
+        invalidate_responses("teams")
+
+        fresh = self.client.get("/teams/list/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(len(fresh.json()), 3)
+        self.assertNotEqual(fresh["ETag"], etag)
+
+    def test_params_the_view_ignores_share_an_entry(self):
+        self.client.get("/teams/list/")
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/teams/list/", {"utm_source": "mail", "_": "123"})
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_cold_stamp_is_not_an_invalidation(self):
+        seeded = _namespace_version("teams")
+
+        self.assertFalse(recently(seeded))
+        self.assertEqual(_namespace_version("teams"), seeded)
+
+        invalidate_responses("teams")
+
+        self.assertTrue(recently(_namespace_version("teams")))
+
+        cache.clear()
+
+        self.assertNotEqual(_namespace_version("teams"), seeded)
+
+
+class DbHelperTests(TestCase):
+    SQL = "SELECT i AS n, 'p' || i AS name FROM generate_series(1, 5) i ORDER BY i"
+
+    def test_fetch_helpers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(self.SQL)
+            self.assertEqual(dictfetchall(cursor)[0], {"n": 1, "name": "p1"})
+
+            cursor.execute(self.SQL)
+            row = namedtuplefetchall(cursor)[-1]
+            self.assertEqual((row.n, row.name), (5, "p5"))
+
+    def test_stream_yields_every_row_in_order(self):
+        self.assertEqual([r["n"] for r in stream(self.SQL, fetch_size=2)], [1, 2, 3, 4, 5])
+        self.assertEqual(list(stream(self.SQL, row_type="tuple"))[1], (2, "p2"))
+        self.assertEqual(next(stream(self.SQL, row_type="namedtuple")).name, "p1")
+
+        with self.assertRaises(ValueError):
+            next(stream(self.SQL, row_type="list"))
+
+    def test_stream_reads_through_a_server_side_cursor(self):
+        rows = stream("SELECT i FROM generate_series(1, 10) i", fetch_size=3)
+        next(rows)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM pg_cursors")
+            open_cursors = cursor.fetchone()[0]
+
+        self.assertEqual(open_cursors, 1)
+        self.assertEqual(sum(1 for _ in rows), 9)
+
+
+class KeyTests(TestCase):
+    def test_sql_builders_match_the_python_ones(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT
+                    {keys.fantasy_team_id_sql("%s", "%s")},
+                    {keys.mp_id_sql("%s", "%s")},
+                    {keys.stat_id_sql(keys.mp_id_sql("%s", "%s"))}
+            """, [7, 12, 12, "AAA001", 12, "AAA001"])
+
+            row = cursor.fetchone()
+
+        self.assertEqual(row, (
+            keys.fantasy_team_id(7, 12),
+            keys.mp_id(12, "AAA001"),
+            keys.stat_id(keys.mp_id(12, "AAA001")),
+        ))
+        self.assertEqual(row, ("7_12", "12_AAA001", "12_AAA001_STAT"))
+
+    def test_sql_builders_take_column_expressions(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT {keys.mp_id_sql("v.match_id", "v.player_id")}
+                FROM (VALUES (1, 'AAA001'), (10, 'BBB002')) v (match_id, player_id)
+                ORDER BY 1
+            """)
+
+            self.assertEqual(cursor.fetchall(), [("10_BBB002",), ("1_AAA001",)])
+
+
+@mock.patch.object(middleware, "SAMPLE_RATE", 1.0)
+class QueryTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO teams (team_id, team_name, acronym) VALUES (1, 'Alpha', 'AAA');
+
+                INSERT INTO players (player_id, player_name, role, cost, team_id)
+                VALUES ('AAA001', 'Alpha 1', 'BATTER', 8, 1);
+            """)
+
+        cls.admin = User.objects.create_superuser("admin", password="x")
+
+    def setUp(self):
+        with middleware._lock:
+            middleware._histogram.clear()
+            middleware._samples = 0
+
+    def test_queries_are_counted_per_endpoint(self):
+        response = self.client.get("/leaderboard/api/overall/")
+
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[0-9.]+;desc="1 queries", sql1;dur=')
+
+        self.client.get("/leaderboard/api/overall/")
+        entry = middleware.histogram_snapshot()["leaderboard:overall_leaderboard"]
+
+        self.assertEqual((entry["requests"], entry["queries"], entry["max_queries"]), (2, 2, 1))
+        self.assertEqual(sum(entry["buckets"]), 2)
+
+    def test_streamed_body_is_counted_once_consumed(self):
+        self.client.force_login(self.admin)
+        endpoint = "admin_panel:list_players_api"
+
+        self.client.get("/admin_panel/players/")
+        regular = middleware.histogram_snapshot()[endpoint]["queries"]
+
+        response = self.client.get("/admin_panel/players/", {"stream": "ndjson"})
+
+        self.assertEqual(middleware.histogram_snapshot()[endpoint]["requests"], 1)
+
+        b"".join(response.streaming_content)
+        entry = middleware.histogram_snapshot()[endpoint]
+
+        self.assertEqual(entry["requests"], 2)
+        self.assertEqual(entry["queries"], 2 * regular)
+
+    def test_histogram_is_logged_and_reset(self):
+        with mock.patch.object(middleware, "DUMP_EVERY", 2), \
+                self.assertLogs("npl_fatasy.querytiming", "INFO") as logs:
+            self.client.get("/leaderboard/api/overall/")
+            self.client.get("/leaderboard/api/overall/")
+
+        report = json.loads(logs.records[0].getMessage())
+        self.assertEqual(report["endpoints"]["leaderboard:overall_leaderboard"]["requests"], 2)
+        self.assertEqual(middleware.histogram_snapshot(), {})
+
+    def test_report_is_admin_only(self):
+        self.client.force_login(User.objects.create_user("user", password="x"))
+        self.assertEqual(self.client.get("/admin_panel/query-timing/").status_code, 403)
+
+        self.client.force_login(self.admin)
+        report = self.client.get("/admin_panel/query-timing/").json()
+
+        self.assertEqual(report["bucket_bounds_ms"], middleware.BUCKETS_MS)
+        self.assertIn("admin_panel:query_timing_api", report["endpoints"])
+
+
+@mock.patch.object(routing, "REPLICAS", ["replica_1"])
+class ReplicaRoutingTests(SimpleTestCase):
+    """No transaction is open here, so reads can go to the (patched) replica."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        # Views called without the middleware elsewhere leave the pin set.
+        self.addCleanup(routing._pinned.reset, routing._pinned.set(False))
+
+    def serve(self, request, write=False):
+        def view(request):
+            response = HttpResponse(routing.read_alias())
+            if write:
+                routing.pin_to_primary(request)
+                response["X-After-Write"] = routing.read_alias()
+            return response
+
+        return routing.ReplicaPinningMiddleware(view)(request)
+
+    def test_gets_read_the_replica_and_writes_the_primary(self):
+        self.assertEqual(self.serve(self.factory.get("/")).content, b"replica_1")
+        self.assertEqual(self.serve(self.factory.head("/")).content, b"replica_1")
+        self.assertEqual(self.serve(self.factory.post("/")).content, b"default")
+
+    def test_a_write_pins_the_browser_to_the_primary(self):
+        response = self.serve(self.factory.get("/"), write=True)
+
+        self.assertEqual(response["X-After-Write"], "default")
+        cookie = response.cookies[routing.STICKY_COOKIE]
+        self.assertEqual(cookie["max-age"], routing.REPLICA_STICKY_SECONDS)
+        self.assertTrue(cookie["httponly"])
+
+        request = self.factory.get("/")
+        request.COOKIES[routing.STICKY_COOKIE] = cookie.value
+        self.assertEqual(self.serve(request).content, b"default")
+
+        self.assertNotIn(routing.STICKY_COOKIE, self.serve(self.factory.get("/")).cookies)
+        self.assertEqual(routing.read_alias(), "replica_1")
+
+    def test_async_requests_are_pinned_the_same_way(self):
+        async def view(request):
+            return HttpResponse(routing.read_alias())
+
+        pinning = routing.ReplicaPinningMiddleware(view)
+
+        self.assertEqual(asyncio.run(pinning(self.factory.get("/"))).content, b"replica_1")
+        self.assertEqual(asyncio.run(pinning(self.factory.post("/"))).content, b"default")
+
+    def test_primary_reads_and_primary_only_apps(self):
+        with routing.primary_reads():
+            self.assertEqual(routing.read_alias(), "default")
+        self.assertEqual(routing.read_alias(), "replica_1")
+
+        router = routing.PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Session), "default")
+        self.assertEqual(router.db_for_read(User), "default")
+        self.assertEqual(router.db_for_write(User), "default")
+
+    def test_rebuild_after_an_invalidation_reads_the_primary(self):
+        cache.clear()
+        with _rebuild_reads(_namespace_version("teams")):
+            self.assertEqual(routing.read_alias(), "replica_1")
+
+        invalidate_responses("teams")
+        with _rebuild_reads(_namespace_version("teams")):
+            self.assertEqual(routing.read_alias(), "default")
+
+
+class ConnectionPoolTests(TransactionTestCase):
+    def query_pid(self):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_backend_pid()")
+                return cursor.fetchone()[0]
+        finally:
+            # Back to the pool, as at the end of a request.
+            connection.close()
+
+    def test_postgres_aliases_are_pooled(self):
+        self.assertIn("default", pooled_aliases())
+        self.query_pid()
+
+        options = connection.settings_dict["OPTIONS"]["pool"]
+        self.assertEqual(connection.settings_dict["CONN_MAX_AGE"], 0)
+        self.assertEqual(connection.pool.max_size, options["max_size"])
+        self.assertEqual(connection.pool.timeout, options["timeout"])
+
+    def test_connections_are_reused_and_counted(self):
+        pool_stats(reset=True)
+
+        pids = {self.query_pid() for _ in range(5)}
+
+        self.assertLessEqual(len(pids), connection.pool.max_size)
+        self.assertEqual(pool_stats()["default"]["requests_num"], 5)
+        self.assertEqual(pool_stats(reset=True)["default"]["requests_num"], 5)
+        self.assertNotIn("requests_num", pool_stats()["default"])
+
+    def test_connection_killed_in_the_pool_is_replaced(self):
+        self.query_pid()
+
+        with psycopg.connect(connection.pool.conninfo, **connection.pool.kwargs) as other:
+            other.execute("""
+                SELECT pg_terminate_backend(pid)
+                FROM pg_stat_activity
+                WHERE datname = current_database() AND pid <> pg_backend_pid()
+            """)
+
+        self.assertIsInstance(self.query_pid(), int)
+        self.assertGreaterEqual(pool_stats()["default"]["connections_lost"], 1)
+
+    def test_check_db_pool_command(self):
+        out = StringIO()
+        call_command("check_db_pool", workers=4, queries=8, sleep=0, stdout=out)
+
+        report = json.loads(out.getvalue())["default"]
+        self.assertEqual(report["queries"], 8)
+        self.assertLessEqual(report["distinct_backends"], report["max_size"])
+
+
+class AsyncViewTests(TransactionTestCase):
+    # The async helpers use their own connections, so the rows are committed
+    # and removed again by hand (the tables are unmanaged).
+    PAIRS = [
+        ("/leaderboard/api/overall/", "/leaderboard/api/async/overall/"),
+        ("/leaderboard/api/match/1/?limit=2", "/leaderboard/api/async/match/1/?limit=2"),
+        ("/fantasy/matches/", "/fantasy/async/matches/"),
+        ("/players/AAA/", "/players/async/AAA/"),
+    ]
+
+    def setUp(self):
+        cache.clear()
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO teams (team_id, team_name, acronym)
+                VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB');
+
+                INSERT INTO players (player_id, player_name, role, cost, team_id)
+                VALUES ('AAA001', 'Alpha 1', 'BATTER', 8.5, 1), ('AAA002', 'Alpha 2', 'BOWLER', 7, 1);
+
+                INSERT INTO matches (match_id, match_date, team_1, team_2)
+                VALUES (1, CURRENT_DATE - 1, 1, 2);
+
+                INSERT INTO users (user_id, username, password)
+                SELECT i, 'user' || i, 'x' FROM generate_series(1, 3) i;
+
+                INSERT INTO fantasy_teams (fantasy_team_id, user_id, match_id, total_points)
+                VALUES ('1_1', 1, 1, 30), ('2_1', 2, 1, 45.5), ('3_1', 3, 1, 30);
+            """)
+
+            # A server default other than Django's, which the pool must override.
+            cursor.execute(
+                f"ALTER DATABASE {connection.ops.quote_name(connection.settings_dict['NAME'])} "
+                "SET timezone = 'Asia/Kathmandu'"
+            )
+
+        update_match_ranks(1)
+        update_overall_leaderboard_for_match(1)
+        update_all_overall_ranks()
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                ALTER DATABASE {connection.ops.quote_name(connection.settings_dict['NAME'])}
+                RESET timezone;
+
+                DELETE FROM overall_leaderboard;
+                DELETE FROM fantasy_teams;
+                DELETE FROM users;
+                DELETE FROM matches;
+                DELETE FROM players;
+                DELETE FROM teams;
+            """)
+
+    async def test_async_views_answer_like_the_sync_ones(self):
+        try:
+            for sync_path, async_path in self.PAIRS:
+                with self.subTest(path=async_path):
+                    expected = await self.async_client.get(sync_path)
+                    response = await self.async_client.get(async_path)
+
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.json(), expected.json())
+        finally:
+            await close_pools()
+
+    async def test_pool_connections_get_djangos_session_setup(self):
+        sql = "SELECT current_setting('TimeZone') AS tz, TIMESTAMPTZ '2026-01-01 12:00+00' AS at"
+
+        def sync_row():
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                return dictfetchall(cursor)[0]
+
+        try:
+            rows = await afetch_all(sql, using="default")
+        finally:
+            await close_pools()
+
+        expected = await sync_to_async(sync_row)()
+
+        self.assertEqual(rows[0], expected)
+        self.assertEqual(rows[0]["tz"], connection.timezone_name)
+        self.assertEqual(rows[0]["at"].isoformat(), expected["at"].isoformat())
+
@@ -0,0 +1,59 @@
+from django.db import connection, transaction
+
+from fantasy_teams.jobs import enqueue_scoring_job
+from fantasy_teams.scoring import rescore_players
+from npl_fatasy import keys
+from .points import refresh_player_points
+
+
+STAT_FIELDS = ["run_rate", "econ", "wickets", "sixes", "fours", "catches", "runs"]
+
+# The INTEGER columns; run_rate and econ are DOUBLE PRECISION.
+COUNT_FIELDS = {"wickets", "sixes", "fours", "catches", "runs"}
+
+
+def save_player_stats(rows):
+    """
+    Upsert a whole scorecard in one statement and refresh points for it.
+
+    rows: iterable of dicts with "mp_id" and the STAT_FIELDS.
+    Rows whose stats are unchanged are skipped by the ON CONFLICT WHERE,
+    so only inserted or modified mp_ids are returned, re-pointed and
+    re-scored into the fantasy teams that picked them. Ranks of the matches
+    that moved are refreshed by a queued scoring job.
+    """
+    values = []
+    params = []
+    for row in rows:
+        values.append("(%s, %s, %s, %s, %s, %s, %s, %s, %s)")
+        params += [keys.stat_id(row["mp_id"]), row["mp_id"]] + [row.get(f, 0) for f in STAT_FIELDS]
+
+    if not values:
+        return []
+
+    columns = ", ".join(STAT_FIELDS)
+    excluded = ", ".join(f"EXCLUDED.{f}" for f in STAT_FIELDS)
+    current = ", ".join(f"player_stats.{f}" for f in STAT_FIELDS)
+    assignments = ", ".join(f"{f} = EXCLUDED.{f}" for f in STAT_FIELDS)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO player_stats
+                (stat_id, mp_id, {columns})
+                VALUES {", ".join(values)}
+                ON CONFLICT (mp_id) DO UPDATE
+                SET {assignments}
+                WHERE ({current}) IS DISTINCT FROM ({excluded})
+                RETURNING mp_id
+            """, params)
+
+            changed = [row[0] for row in cursor.fetchall()]
+
+        refresh_player_points(changed)
+        _, _, match_ids = rescore_players(changed)
+
+        for match_id in match_ids:
+            enqueue_scoring_job(match_id)
+
+    return changed
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS player_match_points (
+                    mp_id TEXT PRIMARY KEY,
+                    match_id INTEGER NOT NULL,
+                    player_id TEXT NOT NULL,
+                    base_points DOUBLE PRECISION NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                CREATE INDEX IF NOT EXISTS player_match_points_match_player_idx
+                    ON player_match_points (match_id, player_id);
+            """,
+            reverse_sql="DROP TABLE IF EXISTS player_match_points;",
+        ),
+        # Backfill from every existing player_stats row. The formula is a
+        # frozen copy of player_stats.points.BASE_POINTS_SQL as of this
+        # migration, so later changes to it don't rewrite history.
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO player_match_points
+                (mp_id, match_id, player_id, base_points, updated_at)
+                SELECT
+                    mp.mp_id,
+                    mp.match_id,
+                    mp.player_id,
+                    (
+                        (COALESCE(ps.runs,0) / 10.0) +
+                        (COALESCE(ps.run_rate,0) / 100.0) +
+                        (CASE
+                            WHEN COALESCE(ps.econ,0) > 0
+                            THEN 10.0 / ps.econ
+                            ELSE 0
+                        END) +
+                        (COALESCE(ps.wickets,0) * 2) +
+                        (COALESCE(ps.sixes,0)) +
+                        (COALESCE(ps.fours,0) * 0.5) +
+                        (COALESCE(ps.catches,0))
+                    ),
+                    NOW()
+                FROM player_stats ps
+                JOIN match_players mp ON mp.mp_id = ps.mp_id
+                ON CONFLICT (mp_id) DO UPDATE
+                SET base_points = EXCLUDED.base_points,
+                    match_id = EXCLUDED.match_id,
+                    player_id = EXCLUDED.player_id,
+                    updated_at = EXCLUDED.updated_at;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
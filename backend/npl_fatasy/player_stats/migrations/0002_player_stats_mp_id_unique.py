@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("player_stats", "0001_player_match_points"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS player_stats_mp_id_key
+                    ON player_stats (mp_id);
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS player_stats_mp_id_key;",
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import connection
+
+
+# Base points for one player_stats row (aliased as ps).
+# This is the only live copy of the formula (migration 0001 keeps a frozen
+# one for its backfill); everything else reads the precomputed
+# player_match_points table.
+BASE_POINTS_SQL = """
+    (
+        (COALESCE(ps.runs,0) / 10.0) +
+        (COALESCE(ps.run_rate,0) / 100.0) +
+        (CASE
+            WHEN COALESCE(ps.econ,0) > 0
+            THEN 10.0 / ps.econ
+            ELSE 0
+        END) +
+        (COALESCE(ps.wickets,0) * 2) +
+        (COALESCE(ps.sixes,0)) +
+        (COALESCE(ps.fours,0) * 0.5) +
+        (COALESCE(ps.catches,0))
+    )
+"""
+
+
+def refresh_player_points(mp_ids=None):
+    """
+    Recompute player_match_points for the given mp_ids
+    (or for every player_stats row when mp_ids is None).
+
+    Returns the number of rows written.
+    """
+    if mp_ids is not None and not mp_ids:
+        return 0
+
+    where = "" if mp_ids is None else "WHERE ps.mp_id = ANY(%s)"
+    params = [] if mp_ids is None else [list(mp_ids)]
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO player_match_points
+            (mp_id, match_id, player_id, base_points, updated_at)
+            SELECT
+                mp.mp_id,
+                mp.match_id,
+                mp.player_id,
+                {BASE_POINTS_SQL},
+                NOW()
+            FROM player_stats ps
+            JOIN match_players mp ON mp.mp_id = ps.mp_id
+            {where}
+            ON CONFLICT (mp_id) DO UPDATE
+            SET base_points = EXCLUDED.base_points,
+                match_id = EXCLUDED.match_id,
+                player_id = EXCLUDED.player_id,
+                updated_at = EXCLUDED.updated_at
+        """, params)
+
+        return cursor.rowcount
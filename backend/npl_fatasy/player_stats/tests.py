@@ -1,3 +1,183 @@
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from fantasy_teams.deadline import lock_match
+from fantasy_teams.jobs import claim_next_job, run_scoring_job
+from leaderboard.standings import update_overall_leaderboard_for_match
+from .bulk import save_player_stats
+
+
+MATCH = 1
+
+
+def fetch(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def seed():
+    # User 1 picked AAA001 as captain and BBB001; the match is over.
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO teams (team_id, team_name, acronym)
+            VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB');
+
+            INSERT INTO players (player_id, player_name, role, cost, team_id)
+            VALUES
+                ('AAA001', 'Alpha 1', 'BATTER', 8, 1),
+                ('BBB001', 'Bravo 1', 'BOWLER', 8, 2);
+
+            INSERT INTO matches (match_id, match_date, team_1, team_2)
+            VALUES (%(match)s, CURRENT_DATE - 1, 1, 2);
+
+            INSERT INTO match_players (mp_id, match_id, player_id, is_playing)
+            VALUES
+                ('1_AAA001', %(match)s, 'AAA001', TRUE),
+                ('1_BBB001', %(match)s, 'BBB001', TRUE);
+
+            INSERT INTO users (user_id, username, password)
+            VALUES (1, 'user1', 'x');
+
+            INSERT INTO fantasy_teams (fantasy_team_id, user_id, match_id, total_points)
+            VALUES ('1_1', 1, %(match)s, 0);
+
+            INSERT INTO fantasy_team_players
+            (fantasy_team_id, match_id, user_id, player_id, is_captain, is_vice_captain)
+            VALUES
+                ('1_1', %(match)s, 1, 'AAA001', TRUE, FALSE),
+                ('1_1', %(match)s, 1, 'BBB001', FALSE, FALSE);
+        """, {"match": MATCH})
+
+    lock_match(MATCH)
+    update_overall_leaderboard_for_match(MATCH)
+
+
+class SavePlayerStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed()
+
+    def points(self):
+        return fetch("""
+            SELECT ft.total_points, ol.total_points
+            FROM fantasy_teams ft
+            JOIN overall_leaderboard ol ON ol.user_id = ft.user_id
+            WHERE ft.user_id = 1
+        """)[0]
+
+    def test_insert_scores_the_picking_teams(self):
+        changed = save_player_stats([
+            {"mp_id": "1_AAA001", "runs": 50},
+            {"mp_id": "1_BBB001", "wickets": 2},
+        ])
+
+        self.assertEqual(sorted(changed), ["1_AAA001", "1_BBB001"])
+        # Captain: 50 runs / 10 x 2, plus 2 wickets x 2.
+        self.assertEqual(self.points(), (14, 14))
+
+    def test_unchanged_rows_are_skipped(self):
+        save_player_stats([
+            {"mp_id": "1_AAA001", "runs": 50},
+            {"mp_id": "1_BBB001", "wickets": 2},
+        ])
+        stats = dict(fetch("SELECT mp_id, ctid::text FROM player_stats"))
+
+        self.assertEqual(save_player_stats([
+            {"mp_id": "1_AAA001", "runs": 50},
+            {"mp_id": "1_BBB001", "wickets": 2},
+        ]), [])
+        self.assertEqual(dict(fetch("SELECT mp_id, ctid::text FROM player_stats")), stats)
+
+        changed = save_player_stats([
+            {"mp_id": "1_AAA001", "runs": 60},
+            {"mp_id": "1_BBB001", "wickets": 2},
+        ])
+
+        self.assertEqual(changed, ["1_AAA001"])
+        self.assertEqual(fetch("SELECT COUNT(*) FROM player_stats"), [(2,)])
+        self.assertEqual(self.points(), (16, 16))
+
+    def test_overall_total_is_recomputed_not_shifted(self):
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE overall_leaderboard SET total_points = 999 WHERE user_id = 1")
+
+        save_player_stats([{"mp_id": "1_AAA001", "runs": 50}])
+
+        self.assertEqual(self.points(), (10, 10))
+
+    def test_ranks_are_left_to_the_scoring_job(self):
+        save_player_stats([{"mp_id": "1_AAA001", "runs": 50}])
+
+        self.assertEqual(fetch("SELECT match_rank FROM fantasy_teams"), [(None,)])
+        self.assertEqual(fetch("SELECT rank FROM overall_leaderboard"), [(None,)])
+
+        job_id, match_id, last_user_id = claim_next_job()
+        self.assertEqual(match_id, MATCH)
+        run_scoring_job(job_id, match_id, last_user_id)
+
+        self.assertEqual(fetch("SELECT total_points, match_rank FROM fantasy_teams"), [(10, 1)])
+        self.assertEqual(fetch("SELECT rank FROM overall_leaderboard"), [(1,)])
+
+    def test_open_match_is_not_locked(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO matches (match_id, match_date, team_1, team_2)
+                VALUES (2, CURRENT_DATE + 1, 2, 1);
+
+                INSERT INTO match_players (mp_id, match_id, player_id, is_playing)
+                VALUES ('2_AAA001', 2, 'AAA001', TRUE);
+            """)
+
+        self.assertEqual(save_player_stats([{"mp_id": "2_AAA001", "runs": 50}]), ["2_AAA001"])
+
+        self.assertEqual(fetch("SELECT match_id FROM match_locks ORDER BY match_id"), [(MATCH,)])
+        self.assertEqual(fetch("SELECT COUNT(*) FROM scoring_jobs WHERE match_id = 2"), [(0,)])
+
+
+class BulkStatsApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed()
+        cls.admin = User.objects.create_superuser("admin", password="x")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def post(self, **stats):
+        return self.client.post(
+            f"/player_stats/{MATCH}/bulk/",
+            {"players": [{"mp_id": "1_AAA001", **stats}]},
+            content_type="application/json",
+        )
+
+    def test_valid_scorecard_is_saved(self):
+        response = self.post(runs=50, run_rate=150.5, econ=0)
+
+        self.assertEqual(response.json(), {"status": "saved", "changed": 1, "mp_ids": ["1_AAA001"]})
+        self.assertEqual(fetch("SELECT runs, run_rate FROM player_stats"), [(50, 150.5)])
+
+    def test_bad_values_are_rejected(self):
+        for stats in (
+            {"runs": 12.7},
+            {"runs": 12.0},
+            {"wickets": -1},
+            {"catches": True},
+            {"sixes": "3"},
+            {"econ": -0.5},
+            {"run_rate": "fast"},
+        ):
+            with self.subTest(**stats):
+                self.assertEqual(self.post(**stats).status_code, 400)
+
+        self.assertEqual(fetch("SELECT COUNT(*) FROM player_stats"), [(0,)])
+
+    def test_non_finite_rates_are_rejected(self):
+        response = self.client.post(
+            f"/player_stats/{MATCH}/bulk/",
+            '{"players": [{"mp_id": "1_AAA001", "econ": NaN}]}',
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import manage_player_stats
+from .views import manage_player_stats, player_stats_bulk_api
 
 urlpatterns = [
     path("<int:match_id>/", manage_player_stats, name="manage_player_stats"),
+    path("<int:match_id>/bulk/", player_stats_bulk_api, name="player_stats_bulk_api"),
 ]
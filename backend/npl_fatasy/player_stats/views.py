@@ -1,11 +1,12 @@
 from django.shortcuts import render, redirect
+from django.http import JsonResponse
 from django.db import connection
-from users.auth import login_required
-
-
-def dictfetchall(cursor):
-    columns = [col[0] for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+from django.views.decorators.csrf import csrf_exempt
+from django.contrib.auth.decorators import login_required
+import json
+import math
+from npl_fatasy.db import dictfetchall
+from .bulk import COUNT_FIELDS, STAT_FIELDS, save_player_stats
 
 
 def manage_player_stats(request, match_id):
@@ -38,51 +39,82 @@ def manage_player_stats(request, match_id):
 
         players = dictfetchall(cursor)
 
-    # 2. Save stats
+    # 2. Save stats (one upsert for the whole form)
     if request.method == "POST":
-        with connection.cursor() as cursor:
-            for p in players:
-                mp_id = p["mp_id"]
-                stat_id = f"{mp_id}_STAT"
-
-                run_rate = request.POST.get(f"run_rate_{mp_id}", 0)
-                econ = request.POST.get(f"econ_{mp_id}", 0)
-                wickets = request.POST.get(f"wickets_{mp_id}", 0)
-                sixes = request.POST.get(f"sixes_{mp_id}", 0)
-                fours = request.POST.get(f"fours_{mp_id}", 0)
-                catches = request.POST.get(f"catches_{mp_id}", 0)
-                runs = request.POST.get(f"runs_{mp_id}", 0)
-
-                # Check if stats already exist
-                cursor.execute("""
-                    SELECT 1 FROM player_stats WHERE mp_id = %s
-                """, [mp_id])
-
-                exists = cursor.fetchone()
-
-                if exists:
-                    cursor.execute("""
-                        UPDATE player_stats
-                        SET run_rate=%s, econ=%s, wickets=%s,
-                            sixes=%s, fours=%s, catches=%s, runs=%s
-                        WHERE mp_id=%s
-                    """, [
-                        run_rate, econ, wickets,
-                        sixes, fours, catches, runs, mp_id
-                    ])
-                else:
-                    cursor.execute("""
-                        INSERT INTO player_stats
-                        (stat_id, mp_id, run_rate, econ, wickets, sixes, fours, catches, runs)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, [
-                        stat_id, mp_id, run_rate, econ,
-                        wickets, sixes, fours, catches, runs
-                    ])
-
-        return redirect("match_list")
+        save_player_stats([
+            {
+                "mp_id": p["mp_id"],
+                **{f: request.POST.get(f"{f}_{p['mp_id']}", 0) for f in STAT_FIELDS}
+            }
+            for p in players
+        ])
+
+        return redirect("manage_player_stats", match_id=match_id)
 
     return render(request, "manage_stats.html", {
         "players": players,
         "match_id": match_id
     })
+
+
+@csrf_exempt
+@login_required
+def player_stats_bulk_api(request, match_id):
+    """
+    JSON API:
+    POST /player_stats/<match_id>/bulk/
+    {"players": [{"mp_id": "...", "runs": 10, "wickets": 1, ...}, ...]}
+    Only rows whose stats actually changed are written.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    entries = data.get("players")
+    if not isinstance(entries, list):
+        return JsonResponse({"error": "players list required"}, status=400)
+
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT mp_id
+            FROM match_players
+            WHERE match_id = %s
+              AND is_playing = TRUE
+        """, [match_id])
+
+        playing = {row[0] for row in cursor.fetchall()}
+
+    # Keyed by mp_id: a duplicate entry would make the upsert touch a row twice
+    rows = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or entry.get("mp_id") not in playing:
+            return JsonResponse({"error": "Unknown or non-playing mp_id"}, status=400)
+
+        row = {"mp_id": entry["mp_id"]}
+        for f in STAT_FIELDS:
+            value = entry.get(f, 0)
+            if f in COUNT_FIELDS:
+                # Postgres would silently round a float into the INTEGER column
+                if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                    return JsonResponse({"error": f"{f} must be a whole number >= 0"}, status=400)
+            elif (
+                isinstance(value, bool)
+                or not isinstance(value, (int, float))
+                or not math.isfinite(value)
+                or value < 0
+            ):
+                return JsonResponse({"error": f"{f} must be a number >= 0"}, status=400)
+            row[f] = value
+        rows[row["mp_id"]] = row
+
+    changed = save_player_stats(rows.values())
+
+    return JsonResponse({
+        "status": "saved",
+        "changed": len(changed),
+        "mp_ids": changed
+    })
@@ -0,0 +1,63 @@
+from django.db import IntegrityError, connection, transaction
+
+
+# Player ids are "<team acronym><number>", e.g. "ABC007". The last number
+# handed out per acronym lives in player_id_counters, so a new id is one
+# row-locked increment instead of a scan of the players table, and two
+# admins adding players to the same team can never get the same id.
+
+CREATE_PLAYER_SQL = """
+    WITH team AS (
+        SELECT acronym FROM teams WHERE team_id = %s
+    ),
+    counter AS (
+        INSERT INTO player_id_counters (acronym, last_number)
+        SELECT acronym, 1 FROM team
+        ON CONFLICT (acronym) DO UPDATE
+        SET last_number = player_id_counters.last_number + 1
+        RETURNING acronym, last_number
+    )
+    INSERT INTO players (player_id, player_name, role, cost, team_id)
+    SELECT
+        acronym || LPAD(last_number::text, GREATEST(3, LENGTH(last_number::text)), '0'),
+        %s, %s, %s, %s
+    FROM counter
+    RETURNING player_id
+"""
+
+
+def sync_player_id_counters(team_id=None):
+    """
+    Move the counters up past every existing "<acronym><number>" player id,
+    for one team's acronym or for all of them.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO player_id_counters (acronym, last_number)
+            SELECT t.acronym, MAX(SUBSTRING(p.player_id FROM LENGTH(t.acronym) + 1)::int)
+            FROM teams t
+            JOIN players p ON p.player_id ~ ('^' || t.acronym || '[0-9]+$')
+            WHERE %s::int IS NULL OR t.team_id = %s
+            GROUP BY t.acronym
+            ON CONFLICT (acronym) DO UPDATE
+            SET last_number = GREATEST(player_id_counters.last_number, EXCLUDED.last_number)
+        """, [team_id, team_id])
+
+
+def create_player(player_name, role, cost, team_id):
+    """
+    Insert a player under the next free id of its team's acronym.
+    Returns the new player_id, or None if the team does not exist.
+    """
+    for attempt in range(2):
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(CREATE_PLAYER_SQL, [team_id, player_name, role, cost, team_id])
+                row = cursor.fetchone()
+            return row[0] if row else None
+        except IntegrityError:
+            # An id entered by hand (players.add_player) or a renamed
+            # acronym can be ahead of the counter: catch up once and retry.
+            if attempt:
+                raise
+            sync_player_id_counters(team_id)
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS players_team_idx
+                    ON players (team_id);
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS players_team_idx;",
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("players", "0001_players_team_idx"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS player_id_counters (
+                    acronym TEXT PRIMARY KEY,
+                    last_number INTEGER NOT NULL
+                );
+            """,
+            reverse_sql="DROP TABLE IF EXISTS player_id_counters;",
+        ),
+        # Start every acronym's counter at its highest existing
+        # "<acronym><number>" player id. Inlined rather than calling
+        # players.ids, so the migration keeps doing what it did when written.
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO player_id_counters (acronym, last_number)
+                SELECT t.acronym, MAX(SUBSTRING(p.player_id FROM LENGTH(t.acronym) + 1)::int)
+                FROM teams t
+                JOIN players p ON p.player_id ~ ('^' || t.acronym || '[0-9]+$')
+                GROUP BY t.acronym
+                ON CONFLICT (acronym) DO UPDATE
+                SET last_number = GREATEST(player_id_counters.last_number, EXCLUDED.last_number);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
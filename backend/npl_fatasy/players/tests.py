@@ -1,3 +1,91 @@
-from django.test import TestCase
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TransactionTestCase
+
+from admin_panel.views import add_match_api, add_team_api
+from .ids import create_player
+
+
+THREADS = 8
+
+
+def fetch(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def run_together(fn, count=THREADS):
+    """Call fn(i) from `count` threads, each on its own connection, released at once."""
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        try:
+            barrier.wait()
+            return fn(i)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(count) as pool:
+        return list(pool.map(worker, range(count)))
+
+
+class ConcurrentIdTests(TransactionTestCase):
+    # The tables are unmanaged, so the flush between tests doesn't empty them.
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO teams (team_id, team_name, acronym)
+                VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB');
+
+                SELECT setval('teams_team_id_alloc_seq', 3, false);
+            """)
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                DELETE FROM matches;
+                DELETE FROM players;
+                DELETE FROM player_id_counters;
+                DELETE FROM teams;
+            """)
+
+    def post(self, view, data):
+        request = RequestFactory().post("/", json.dumps(data), content_type="application/json")
+        request.user = User(username="admin", is_superuser=True)
+        return json.loads(view(request).content)
+
+    def test_concurrent_players_get_distinct_ids(self):
+        ids = run_together(lambda i: create_player(f"Alpha {i}", "BATTER", 8, 1))
+
+        self.assertEqual(sorted(ids), [f"AAA{n:03}" for n in range(1, THREADS + 1)])
+        self.assertEqual(fetch("SELECT last_number FROM player_id_counters"), [(THREADS,)])
+
+    def test_counter_catches_up_with_a_hand_entered_id(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO players (player_id, player_name, role, cost, team_id)
+                VALUES ('BBB001', 'Bravo 1', 'BATTER', 8, 2)
+            """)
+
+        self.assertEqual(create_player("Bravo 2", "BOWLER", 8, 2), "BBB002")
+        self.assertIsNone(create_player("Nobody", "BOWLER", 8, 99))
+
+    def test_concurrent_teams_and_matches_get_distinct_ids(self):
+        teams = run_together(lambda i: self.post(add_team_api, {
+            "team_name": f"Team {i}", "acronym": f"T{i:02}",
+        }))
+        matches = run_together(lambda i: self.post(add_match_api, {
+            "match_date": "2999-01-01", "team_1": 1, "team_2": 2,
+        }))
+
+        team_ids = [body["team_id"] for body in teams]
+        match_ids = [body["match_id"] for body in matches]
+
+        self.assertEqual(sorted(team_ids), list(range(3, 3 + THREADS)))
+        self.assertEqual(len(set(match_ids)), THREADS)
+        self.assertEqual(fetch("SELECT COUNT(*) FROM matches"), [(THREADS,)])
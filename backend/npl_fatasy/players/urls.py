@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import players_by_team_api, add_player
+from .views import players_by_team_api, players_by_team_async_api, add_player
 
 urlpatterns = [
     path("add/", add_player, name="add_player"),
+    path("async/<str:acronym>/", players_by_team_async_api, name="players_by_team_async"),
     path("<str:acronym>/", players_by_team_api, name="players_by_team"),
 ]
\ No newline at end of file
@@ -1,15 +1,12 @@
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.db import connection, IntegrityError
+from npl_fatasy.db import dictfetchall
 from users.auth import login_required
-
-
-# =========================
-# Helper
-# =========================
-def dictfetchall(cursor):
-    columns = [col[0] for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+from fantasy_teams.catalog import invalidate_squads
+from npl_fatasy.adb import afetch_all
+from npl_fatasy.cache import cached_json, invalidate_responses
+from npl_fatasy.routing import read_connection
 
 
 # =========================
@@ -72,6 +69,8 @@ def add_player(request):
                     VALUES (%s, %s, %s, %s, %s)
                 """, [player_id, player_name, role, cost, team_id])
 
+            invalidate_squads()
+            invalidate_responses("players")
             return redirect("add_player")
 
         except IntegrityError:
@@ -87,23 +86,38 @@ def add_player(request):
 # API VIEWS (FOR REACT)
 # =========================
 
+PLAYERS_BY_TEAM_SQL = """
+    SELECT 
+        p.player_id,
+        p.player_name,
+        p.role,
+        p.cost
+    FROM players p
+    JOIN teams t ON p.team_id = t.team_id
+    WHERE t.acronym = %s
+    ORDER BY p.player_name
+"""
+
+
+@cached_json("players")
 def players_by_team_api(request, acronym):
     """
     JSON API:
     GET /api/players/<TEAM_ACRONYM>/
     """
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT 
-                p.player_id,
-                p.player_name,
-                p.role,
-                p.cost
-            FROM players p
-            JOIN teams t ON p.team_id = t.team_id
-            WHERE t.acronym = %s
-            ORDER BY p.player_name
-        """, [acronym.upper()])
+    with read_connection().cursor() as cursor:
+        cursor.execute(PLAYERS_BY_TEAM_SQL, [acronym.upper()])
         players = dictfetchall(cursor)
 
     return JsonResponse(players, safe=False)
+
+
+@cached_json("players")
+async def players_by_team_async_api(request, acronym):
+    """
+    JSON API (ASGI):
+    GET /players/async/<TEAM_ACRONYM>/
+    """
+    players = await afetch_all(PLAYERS_BY_TEAM_SQL, [acronym.upper()])
+
+    return JsonResponse(players, safe=False)
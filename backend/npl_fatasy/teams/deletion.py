@@ -0,0 +1,116 @@
+from django.db import connection, transaction
+
+from leaderboard.standings import update_all_overall_ranks
+
+
+# Everything that hangs off a team or a match, children first:
+# (table, predicate) over the deleted matches and/or players. Each step is
+# one set-based DELETE of the matching rows, unless the cascade's updates
+# have a statement for the table. Several of these tables have no foreign
+# keys, so a table missing here would be left with orphans.
+TEAM_MATCHES = "SELECT match_id FROM matches WHERE team_1 = %(team_id)s OR team_2 = %(team_id)s"
+TEAM_PLAYERS = "SELECT player_id FROM players WHERE team_id = %(team_id)s"
+ONE_MATCH = "SELECT %(match_id)s::int"
+
+
+def _match_steps(matches, players=None):
+    """
+    Steps for the rows derived from the `matches` and, if given, `players`
+    subqueries, up to and including match_players.
+    """
+    in_matches = f"match_id IN ({matches})"
+    either = in_matches if players is None else f"{in_matches} OR player_id IN ({players})"
+
+    return [
+        ("overall_leaderboard", f"""
+            user_id IN (SELECT user_id FROM fantasy_teams WHERE {in_matches})
+        """),
+        ("fantasy_team_players", either),
+        ("fantasy_team_snapshots", in_matches),
+        ("match_locks", in_matches),
+        ("fantasy_teams", in_matches),
+        ("scoring_jobs", in_matches),
+        ("player_ownership", either),
+        ("player_match_points", either),
+        ("player_stats", f"""
+            mp_id IN (SELECT mp_id FROM match_players WHERE {either})
+        """),
+        ("match_players", either),
+    ]
+
+
+def _take_back_points(matches):
+    # Users stay on the board; the deleted matches' points come off their totals.
+    return {
+        "overall_leaderboard": f"""
+            UPDATE overall_leaderboard ol
+            SET total_points = ol.total_points - gone.total_points,
+                updated_at = NOW()
+            FROM (
+                SELECT user_id, SUM(total_points) AS total_points
+                FROM fantasy_teams
+                WHERE match_id IN ({matches})
+                GROUP BY user_id
+            ) gone
+            WHERE ol.user_id = gone.user_id
+        """,
+    }
+
+
+CASCADE_STEPS = _match_steps(TEAM_MATCHES, TEAM_PLAYERS) + [
+    ("matches", "team_1 = %(team_id)s OR team_2 = %(team_id)s"),
+    ("players", "team_id = %(team_id)s"),
+    ("teams", "team_id = %(team_id)s"),
+]
+UPDATES = _take_back_points(TEAM_MATCHES)
+
+MATCH_CASCADE_STEPS = _match_steps(ONE_MATCH) + [
+    ("matches", "match_id = %(match_id)s"),
+]
+MATCH_UPDATES = _take_back_points(ONE_MATCH)
+
+
+def _cascade(steps, updates, params, dry_run):
+    """
+    Run the steps in one transaction. Returns {table: rows affected}. A
+    dry_run only counts the rows each step would touch, with the same
+    predicates; it writes and locks nothing.
+    """
+    counts = {}
+
+    if dry_run:
+        with connection.cursor() as cursor:
+            for table, predicate in steps:
+                cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {predicate}", params)
+                counts[table] = cursor.fetchone()[0]
+
+        return counts
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for table, predicate in steps:
+                cursor.execute(
+                    updates.get(table, f"DELETE FROM {table} WHERE {predicate}"), params
+                )
+                counts[table] = cursor.rowcount
+
+        if counts["overall_leaderboard"]:
+            update_all_overall_ranks()
+
+    return counts
+
+
+def delete_team(team_id, dry_run=False):
+    """
+    Delete a team with its players, matches and everything derived from
+    them, in one transaction. Returns {table: rows affected}.
+    """
+    return _cascade(CASCADE_STEPS, UPDATES, {"team_id": team_id}, dry_run)
+
+
+def delete_match(match_id, dry_run=False):
+    """
+    Delete one match with its squads, stats, fantasy teams and everything
+    derived from them, in one transaction. Returns {table: rows affected}.
+    """
+    return _cascade(MATCH_CASCADE_STEPS, MATCH_UPDATES, {"match_id": match_id}, dry_run)
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS teams_acronym_idx
+                    ON teams (acronym);
+            """,
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS teams_acronym_idx;",
+        ),
+    ]
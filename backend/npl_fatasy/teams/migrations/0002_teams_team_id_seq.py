@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("teams", "0001_teams_acronym_idx"),
+    ]
+
+    operations = [
+        # team_id was allocated as MAX + 1, which races between admins.
+        # Inserts now take nextval() from this sequence in the same statement.
+        migrations.RunSQL(
+            sql="""
+                CREATE SEQUENCE IF NOT EXISTS teams_team_id_alloc_seq
+                    OWNED BY teams.team_id;
+
+                SELECT setval(
+                    'teams_team_id_alloc_seq',
+                    GREATEST(
+                        (SELECT COALESCE(MAX(team_id), 0) + 1 FROM teams),
+                        (SELECT last_value FROM teams_team_id_alloc_seq)
+                    ),
+                    false
+                );
+            """,
+            reverse_sql="DROP SEQUENCE IF EXISTS teams_team_id_alloc_seq;",
+        ),
+    ]
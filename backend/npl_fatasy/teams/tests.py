@@ -1,3 +1,160 @@
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from fantasy_teams.deadline import lock_match
+from fantasy_teams.jobs import enqueue_scoring_job
+from leaderboard.standings import (
+    update_all_overall_ranks,
+    update_overall_leaderboard_for_match,
+)
+from player_stats.points import refresh_player_points
+from .deletion import CASCADE_STEPS, MATCH_CASCADE_STEPS, delete_team
+
+
+def fetch(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def row_counts():
+    return {
+        table: fetch(f"SELECT COUNT(*) FROM {table}")[0][0]
+        for table, _ in CASCADE_STEPS
+    }
+
+
+class DeleteTeamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Alpha plays Bravo in match 1, Bravo plays Charlie in match 2.
+        # User 1 has teams in both (40 + 25), user 2 only in match 2 (30).
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO teams (team_id, team_name, acronym)
+                VALUES (1, 'Alpha', 'AAA'), (2, 'Bravo', 'BBB'), (3, 'Charlie', 'CCC');
+
+                INSERT INTO players (player_id, player_name, role, cost, team_id)
+                SELECT t.acronym || '00' || i, t.team_name || ' ' || i, 'BATTER', 8, t.team_id
+                FROM teams t
+                CROSS JOIN generate_series(1, 2) i;
+
+                INSERT INTO matches (match_id, match_date, team_1, team_2)
+                VALUES (1, CURRENT_DATE - 2, 1, 2), (2, CURRENT_DATE - 1, 2, 3);
+
+                INSERT INTO match_players (mp_id, match_id, player_id, is_playing)
+                SELECT m.match_id || '_' || p.player_id, m.match_id, p.player_id, TRUE
+                FROM matches m
+                JOIN players p ON p.team_id IN (m.team_1, m.team_2);
+
+                INSERT INTO player_stats (stat_id, mp_id, runs)
+                VALUES ('1_AAA001_STAT', '1_AAA001', 40);
+
+                INSERT INTO users (user_id, username, password)
+                VALUES (1, 'user1', 'x'), (2, 'user2', 'x');
+
+                INSERT INTO fantasy_teams (fantasy_team_id, user_id, match_id, total_points)
+                VALUES ('1_1', 1, 1, 40), ('1_2', 1, 2, 25), ('2_2', 2, 2, 30);
+
+                INSERT INTO fantasy_team_players
+                (fantasy_team_id, match_id, user_id, player_id, is_captain, is_vice_captain)
+                VALUES
+                    ('1_1', 1, 1, 'AAA001', TRUE, FALSE),
+                    ('1_1', 1, 1, 'BBB001', FALSE, FALSE),
+                    ('1_2', 2, 1, 'BBB001', TRUE, FALSE),
+                    ('1_2', 2, 1, 'CCC001', FALSE, FALSE),
+                    ('2_2', 2, 2, 'BBB002', TRUE, FALSE),
+                    ('2_2', 2, 2, 'CCC002', FALSE, FALSE);
+            """)
+
+        refresh_player_points()
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO player_ownership
+                (match_id, player_id, picks, captain_picks, vice_captain_picks)
+                VALUES (1, 'AAA001', 1, 1, 0), (2, 'BBB002', 1, 1, 0)
+            """)
+        lock_match(1)
+        enqueue_scoring_job(1)
+        for match_id in (1, 2):
+            update_overall_leaderboard_for_match(match_id)
+        update_all_overall_ranks()
+
+    def standings(self):
+        return fetch("""
+            SELECT user_id, total_points, rank FROM overall_leaderboard ORDER BY user_id
+        """)
+
+    def test_dry_run_counts_without_deleting(self):
+        before = row_counts()
+
+        with CaptureQueriesContext(connection) as queries:
+            counts = delete_team(1, dry_run=True)
+
+        self.assertEqual(
+            [q["sql"].split()[:2] for q in queries],
+            [["SELECT", "COUNT(*)"]] * len(CASCADE_STEPS),
+        )
+
+        self.assertEqual(counts, {
+            "overall_leaderboard": 1,
+            "fantasy_team_players": 2,
+            "fantasy_team_snapshots": 2,
+            "match_locks": 1,
+            "fantasy_teams": 1,
+            "scoring_jobs": 1,
+            "player_ownership": 1,
+            "player_match_points": 1,
+            "player_stats": 1,
+            "match_players": 4,
+            "matches": 1,
+            "players": 2,
+            "teams": 1,
+        })
+        self.assertEqual(row_counts(), before)
+        self.assertEqual(self.standings(), [(1, 65, 1), (2, 30, 2)])
+
+    def test_delete_removes_the_team_and_reranks(self):
+        expected = {
+            table: count - delete_team(1, dry_run=True)[table]
+            for table, count in row_counts().items()
+            if table != "overall_leaderboard"
+        }
+
+        delete_team(1)
+
+        after = row_counts()
+        del after["overall_leaderboard"]
+        self.assertEqual(after, expected)
+        self.assertEqual(fetch("SELECT team_id FROM teams ORDER BY team_id"), [(2,), (3,)])
+        self.assertEqual(self.standings(), [(1, 25, 2), (2, 30, 1)])
+
+    def test_deleting_a_match_leaves_no_orphans(self):
+        self.client.force_login(User.objects.create_superuser("admin", password="x"))
+
+        dry_run = self.client.delete("/admin_panel/matches/1/delete/?dry_run=1").json()
+        response = self.client.delete("/admin_panel/matches/1/delete/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["affected"], dry_run["affected"])
+        self.assertEqual(
+            [table for table, _ in MATCH_CASCADE_STEPS],
+            [table for table, _ in CASCADE_STEPS][:-2],
+        )
+
+        for table, _ in MATCH_CASCADE_STEPS:
+            if table in ("overall_leaderboard", "player_stats"):
+                continue
+            with self.subTest(table=table):
+                self.assertEqual(fetch(f"SELECT COUNT(*) FROM {table} WHERE match_id = 1"), [(0,)])
+        self.assertEqual(fetch("SELECT COUNT(*) FROM player_stats"), [(0,)])
+
+        # Match 2 and the teams are untouched; user 1 keeps only match 2's points.
+        self.assertEqual(fetch("SELECT COUNT(*) FROM fantasy_teams"), [(2,)])
+        self.assertEqual(fetch("SELECT COUNT(*) FROM player_ownership"), [(1,)])
+        self.assertEqual(self.standings(), [(1, 25, 2), (2, 30, 1)])
+
+        self.assertEqual(self.client.delete("/admin_panel/matches/1/delete/").status_code, 404)
 
-# Create your tests here.
@@ -1,14 +1,13 @@
 from django.http import JsonResponse
-from django.db import connection
-
-def dictfetchall(cursor):
-    columns = [col[0] for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+from npl_fatasy.db import dictfetchall
+from npl_fatasy.routing import read_connection
+from npl_fatasy.cache import cached_json
 
 
 # JSON API for React
+@cached_json("teams")
 def team_list_api(request):
-    with connection.cursor() as cursor:
+    with read_connection().cursor() as cursor:
         cursor.execute("""
             SELECT team_id, team_name, acronym
             FROM teams
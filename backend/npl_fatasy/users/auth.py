@@ -1,6 +1,15 @@
+from inspect import iscoroutinefunction
+
 from django.shortcuts import redirect
 
 def login_required(view_func):
+    if iscoroutinefunction(view_func):
+        async def async_wrapper(request, *args, **kwargs):
+            if not await request.session.ahas_key("user_id"):
+                return redirect("login")
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
     def wrapper(request, *args, **kwargs):
         if "user_id" not in request.session:
             return redirect("login")